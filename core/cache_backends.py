@@ -0,0 +1,212 @@
+"""
+Two-level cache backend: a small in-process LRU in front of a shared cache.
+
+With ``CACHE_BACKEND = "two-level"`` the default cache is ``TwoLevelCache``.  Reads are
+served from a per-process LRU of up to ``MAX_ENTRIES`` entries when they can, and from
+the shared cache (``CACHES[OPTIONS["SHARED_CACHE"]]``, e.g. Redis) otherwise, so hot keys
+such as rendered fragments cost no network round trip.  Every write goes to the shared
+cache first, and ``add``/``incr``/``decr`` are decided by the shared cache alone.
+
+A value written by another worker is only seen here once the local copy expires, so
+local copies are kept for at most ``LOCAL_TIMEOUT`` seconds - that is how stale a read
+can be.  Integers and booleans are never kept locally: they are the counters, versions
+and flags that other workers ``incr`` or ``add`` without this process seeing it, so
+reading one always goes to the shared cache and sees its current value.
+
+Hit, miss and eviction counts are kept per process, see ``TwoLevelCache.stats``.
+"""
+from collections import Counter, OrderedDict
+import logging
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.functional import cached_property
+
+LOGGER = logging.getLogger(__name__)
+
+# Like LocMemCache, the local level is shared by the cache instances of every thread
+_local_caches = {}
+_expiry_times = {}
+_locks = {}
+_stats = {}
+
+_MISSING = object()
+
+
+class TwoLevelCache(BaseCache):
+    """
+    Cache backend that keeps recently used entries of a shared cache in process memory.
+
+    ``OPTIONS``: ``SHARED_CACHE`` is the alias of the shared cache (default ``"shared"``),
+    ``MAX_ENTRIES`` the size of the local LRU and ``LOCAL_TIMEOUT`` how long (in seconds)
+    local copies are kept.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._shared_alias = options.get("SHARED_CACHE", "shared")
+        self._local_timeout = options.get("LOCAL_TIMEOUT", 5)
+        self._cache = _local_caches.setdefault(name, OrderedDict())
+        self._expire_info = _expiry_times.setdefault(name, {})
+        self._lock = _locks.setdefault(name, threading.Lock())
+        self._stats = _stats.setdefault(name, Counter())
+
+    @cached_property
+    def _shared(self):
+        return caches[self._shared_alias]
+
+    def _timeout_seconds(self, timeout):
+        # BaseCache.get_backend_timeout returns an expiry time, the local level wants seconds
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def _shared_version(self, version):
+        # Keys are versioned by this cache's VERSION, not the shared cache's
+        return self.version if version is None else version
+
+    def _local_get(self, key):
+        """Returns a local copy that has not expired, moving it to the front of the LRU."""
+        with self._lock:
+            value = self._cache.get(key, _MISSING)
+            if value is _MISSING:
+                return _MISSING
+            if self._expire_info[key] <= time.monotonic():
+                del self._cache[key]
+                del self._expire_info[key]
+                return _MISSING
+            self._cache.move_to_end(key, last=False)
+            return value
+
+    def _local_set(self, key, value, timeout=None):
+        """Keeps a local copy for LOCAL_TIMEOUT seconds, or until the shared entry expires if sooner."""
+        local_timeout = self._local_timeout if timeout is None else min(timeout, self._local_timeout)
+        # Counters, versions and flags change in the shared cache without this process knowing
+        if local_timeout <= 0 or isinstance(value, int):
+            self._local_delete(key)
+            return
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key, last=False)
+            self._expire_info[key] = time.monotonic() + local_timeout
+            while len(self._cache) > self._max_entries:
+                evicted, _ = self._cache.popitem()
+                del self._expire_info[evicted]
+                self._stats["evictions"] += 1
+
+    def _local_delete(self, key):
+        with self._lock:
+            if self._cache.pop(key, _MISSING) is not _MISSING:
+                del self._expire_info[key]
+
+    def _count(self, counter, delta=1):
+        with self._lock:
+            self._stats[counter] += delta
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        added = self._shared.add(key, value, timeout, version=self._shared_version(version))
+        if added:
+            self._local_set(local_key, value, self._timeout_seconds(timeout))
+        else:
+            # Another worker holds the key with a value this process may not have seen
+            self._local_delete(local_key)
+        return added
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self._local_get(local_key)
+        if value is not _MISSING:
+            self._count("local_hits")
+            return value
+
+        value = self._shared.get(key, _MISSING, version=self._shared_version(version))
+        if value is _MISSING:
+            self._count("misses")
+            return default
+        self._count("shared_hits")
+        self._local_set(local_key, value)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self._shared.set(key, value, timeout, version=self._shared_version(version))
+        self._local_set(local_key, value, self._timeout_seconds(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.make_and_validate_key(key, version=version)
+        return self._shared.touch(key, timeout, version=self._shared_version(version))
+
+    def delete(self, key, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self._shared.delete(key, version=self._shared_version(version))
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remaining = {}
+        for key in keys:
+            local_key = self.make_and_validate_key(key, version=version)
+            value = self._local_get(local_key)
+            if value is _MISSING:
+                remaining[key] = local_key
+            else:
+                found[key] = value
+        self._count("local_hits", len(found))
+
+        if remaining:
+            shared_values = self._shared.get_many(remaining, version=self._shared_version(version))
+            for key, value in shared_values.items():
+                self._local_set(remaining[key], value)
+            self._count("shared_hits", len(shared_values))
+            self._count("misses", len(remaining) - len(shared_values))
+            found.update(shared_values)
+        return found
+
+    def has_key(self, key, version=None):
+        if self._local_get(self.make_and_validate_key(key, version=version)) is not _MISSING:
+            return True
+        return self._shared.has_key(key, version=self._shared_version(version))
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        # A counter is never kept locally, but drop a non-integer copy the increment will fail on
+        self._local_delete(local_key)
+        return self._shared.incr(key, delta, version=self._shared_version(version))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed_keys = self._shared.set_many(data, timeout, version=self._shared_version(version))
+        timeout_seconds = self._timeout_seconds(timeout)
+        for key, value in data.items():
+            local_key = self.make_and_validate_key(key, version=version)
+            if key in failed_keys:
+                self._local_delete(local_key)
+            else:
+                self._local_set(local_key, value, timeout_seconds)
+        return failed_keys
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local_delete(self.make_and_validate_key(key, version=version))
+        self._shared.delete_many(keys, version=self._shared_version(version))
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._expire_info.clear()
+        self._shared.clear()
+
+    def stats(self):
+        """
+        Returns this process's hit, miss and eviction counts.
+
+        :return: A dict of the counts, the number of local entries and the hit rates.
+        """
+        with self._lock:
+            stats = {counter: self._stats[counter] for counter in ("local_hits", "shared_hits", "misses", "evictions")}
+            stats["local_entries"] = len(self._cache)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["local_hit_rate"] = round(stats["local_hits"] / lookups, 4) if lookups else None
+        stats["hit_rate"] = round((stats["local_hits"] + stats["shared_hits"]) / lookups, 4) if lookups else None
+        return stats
+
@@ -0,0 +1,194 @@
+"""
+In-process stand-in for a Redis server behind Django's Redis cache backend.
+
+With ``CACHE_BACKEND = "local-redis"`` the cache is ``LocalRedisCache``: Django's
+``RedisCache`` with its client pointed at ``LocalRedis`` instead of a Redis server, so the
+Redis code path (serialization, ``SET NX``/``EX`` semantics, integer ``INCR``) can be
+used in tests and load tests without running Redis or installing the redis package.
+It implements the Redis commands the backend issues, storing values as bytes the way
+Redis does, and can sleep for ``CACHE_LOCAL_REDIS_LATENCY`` seconds per command to
+stand in for the network round trip.
+
+Data is kept in memory, so each process has its own "server", shared by every thread.
+"""
+import functools
+import threading
+import time
+
+from django.core.cache.backends.redis import RedisCache, RedisCacheClient, RedisSerializer
+from django.utils.module_loading import import_string
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def _command(method):
+    """Runs a LocalRedis command atomically, after the simulated round trip."""
+
+    @functools.wraps(method)
+    def run_command(self, *args, **kwargs):
+        self._call()
+        with self.lock:
+            return method(self, *args, **kwargs)
+
+    return run_command
+
+
+class LocalRedis:
+    """Implements the Redis commands used by RedisCacheClient in memory."""
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.data = {}
+        self.expires_at = {}
+        self.lock = threading.Lock()
+
+    def _call(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _alive(self, key):
+        expires_at = self.expires_at.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires_at.pop(key, None)
+        return key in self.data
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode()
+
+    def _set(self, key, value, ex=None):
+        self.data[key] = self._encode(value)
+        if ex is None:
+            self.expires_at.pop(key, None)
+        else:
+            self.expires_at[key] = time.monotonic() + ex
+
+    @_command
+    def get(self, key):
+        return self.data[key] if self._alive(key) else None
+
+    @_command
+    def mget(self, keys):
+        return [self.data[key] if self._alive(key) else None for key in keys]
+
+    @_command
+    def set(self, key, value, ex=None, nx=False):
+        if nx and self._alive(key):
+            return None
+        self._set(key, value, ex)
+        return True
+
+    @_command
+    def mset(self, mapping):
+        for key, value in mapping.items():
+            self._set(key, value)
+        return True
+
+    @_command
+    def delete(self, *keys):
+        deleted = sum(1 for key in keys if self._alive(key))
+        for key in keys:
+            self.data.pop(key, None)
+            self.expires_at.pop(key, None)
+        return deleted
+
+    @_command
+    def exists(self, *keys):
+        return sum(1 for key in keys if self._alive(key))
+
+    @_command
+    def expire(self, key, seconds):
+        if not self._alive(key):
+            return False
+        if seconds <= 0:
+            self.data.pop(key)
+            self.expires_at.pop(key, None)
+        else:
+            self.expires_at[key] = time.monotonic() + seconds
+        return True
+
+    @_command
+    def persist(self, key):
+        return self._alive(key) and self.expires_at.pop(key, None) is not None
+
+    @_command
+    def incr(self, key, amount=1):
+        value = int(self.data[key]) if self._alive(key) else 0
+        value += amount
+        # INCR keeps the key's time to live
+        self.data[key] = self._encode(value)
+        return value
+
+    @_command
+    def flushdb(self):
+        self.data.clear()
+        self.expires_at.clear()
+        return True
+
+    def pipeline(self):
+        return _LocalPipeline(self)
+
+
+class _LocalPipeline:
+    """Queues commands and runs them together, as a single round trip."""
+
+    def __init__(self, server):
+        self.server = server
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        self.server._call()
+        with self.server.lock:
+            results = [
+                getattr(LocalRedis, name).__wrapped__(self.server, *args, **kwargs)
+                for name, args, kwargs in self.commands
+            ]
+        self.commands = []
+        return results
+
+
+def local_redis(location, latency=0):
+    """Returns the in-process server for a location, creating it on first use."""
+    with _servers_lock:
+        if location not in _servers:
+            _servers[location] = LocalRedis(latency)
+        return _servers[location]
+
+
+class LocalRedisCacheClient(RedisCacheClient):
+    """RedisCacheClient that sends its commands to a LocalRedis instead of a Redis server."""
+
+    def __init__(self, servers, serializer=None, latency=0, **options):
+        self._servers = servers
+        if isinstance(serializer, str):
+            serializer = import_string(serializer)
+        if callable(serializer):
+            serializer = serializer()
+        self._serializer = serializer or RedisSerializer()
+        self._server = local_redis(servers[0], latency)
+
+    def get_client(self, key=None, *, write=False):
+        return self._server
+
+
+class LocalRedisCache(RedisCache):
+    """
+    Django's Redis cache backend, backed by an in-process LocalRedis.
+
+    ``OPTIONS`` may set ``latency``, the seconds each command takes.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(server or "local-redis", params)
+        self._class = LocalRedisCacheClient
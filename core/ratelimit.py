@@ -0,0 +1,102 @@
+"""
+Fixed-window rate limiting for views, backed by the Django cache.
+
+Each client IP address and each email address posted to a limited view may make
+``AUTH_RATE_LIMIT_BURST`` attempts per window, and a window lasts as long as it takes to
+allow that many attempts at ``AUTH_RATE_LIMIT_PER_MINUTE`` - so bursts are allowed but the
+sustained rate is the per-minute limit.  A POST counts one attempt against each of its
+windows; when any window is over its limit the request is rejected with a 429 before the
+view runs, so excess attempts cost a few cache round trips instead of database queries,
+password hashing, Cognito calls or outbound email.
+
+Attempts are counted with the cache's atomic ``add`` and ``incr``, so concurrent requests
+(in any worker, with a shared cache) can never both take the last attempt of a window.  At
+a window boundary a client can make up to twice the burst in quick succession.
+
+Limiting by email as well as by IP stops a brute-force attempt on one account spread over
+many addresses; limiting by IP stops one client from trying many accounts.
+"""
+from django.conf import settings
+from django.http import HttpResponse
+import functools
+import hashlib
+import logging
+import math
+import time
+
+from core.util import increment_counter
+
+LOGGER = logging.getLogger(__name__)
+
+_KEY_PREFIX = "ratelimit"
+
+
+def client_ip(request):
+    if settings.RATE_LIMIT_USE_X_FORWARDED_FOR:
+        forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
+        if forwarded_for:
+            return forwarded_for.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _bucket_keys(scope, request):
+    keys = [f"{_KEY_PREFIX}:{scope}:ip:{client_ip(request)}"]
+    email = request.POST.get("email", "").strip().lower()
+    if email:
+        # Hashed so any posted value makes a valid cache key
+        keys.append(f"{_KEY_PREFIX}:{scope}:email:{hashlib.sha1(email.encode()).hexdigest()}")
+    return keys
+
+
+def take_token(scope, request, rate_per_minute=None, burst=None):
+    """
+    Counts an attempt against every window of a request.
+
+    :param scope: The name the windows are kept under, usually the view name.
+    :param request: The request.
+    :param rate_per_minute: Sustained attempts allowed per minute. Defaults to AUTH_RATE_LIMIT_PER_MINUTE.
+    :param burst: Attempts allowed per window. Defaults to AUTH_RATE_LIMIT_BURST.
+    :return: 0 if the request is allowed, or the number of seconds until it would be.
+    """
+    rate = (rate_per_minute or settings.AUTH_RATE_LIMIT_PER_MINUTE) / 60
+    burst = burst or settings.AUTH_RATE_LIMIT_BURST
+    window = max(1, math.ceil(burst / rate))
+    now = time.time()
+    window_start = int(now // window) * window
+    remaining = window_start + window - now
+
+    retry_after = 0
+    for key in _bucket_keys(scope, request):
+        attempts = increment_counter(f"{key}:{window_start}", timeout=math.ceil(remaining))
+        if attempts is None:
+            LOGGER.warning(f"Unable to count an attempt for {key} - allowing it")
+        elif attempts > burst:
+            retry_after = remaining
+    return retry_after
+
+
+def rate_limit(scope, rate_per_minute=None, burst=None):
+    """
+    Decorates a view so POSTs beyond the rate limit of their IP or email get a 429.
+
+    :param scope: The name to keep the view's buckets under.
+    :param rate_per_minute: Sustained attempts allowed per minute. Defaults to AUTH_RATE_LIMIT_PER_MINUTE.
+    :param burst: Attempts allowed at once. Defaults to AUTH_RATE_LIMIT_BURST.
+    """
+
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            if request.method == "POST":
+                retry_after = take_token(scope, request, rate_per_minute, burst)
+                if retry_after:
+                    LOGGER.warning(f"Rate limit exceeded for {scope} from {client_ip(request)}")
+                    response = HttpResponse("Too many attempts. Please try again later.", status=429)
+                    response["Retry-After"] = str(math.ceil(retry_after))
+                    return response
+            return view_func(request, *args, **kwargs)
+
+        return wrapped_view
+
+    return decorator
+
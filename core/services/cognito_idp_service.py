@@ -2,20 +2,113 @@ import base64
 import hashlib
 import hmac
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 # from core import settings
 from django.conf import settings
+from django.core.cache import cache
+
+from core.util import CacheStats
 
 LOGGER = logging.getLogger(__name__)
 
 
+_idp_client = None
+_idp_client_lock = threading.Lock()
+
+
+def _cognito_idp_client():
+    """
+    Returns the process-wide boto3 cognito-idp client, creating it on first use.
+
+    boto3 clients are thread-safe, so a single client - with its resolved endpoint,
+    credentials and pool of kept-alive connections - serves every thread of the process.
+    With COGNITO_BACKEND "local" the client is the in-process stand-in from cognito_local.
+    """
+    global _idp_client
+    if _idp_client is None:
+        with _idp_client_lock:
+            if _idp_client is None and settings.COGNITO_BACKEND == "local":
+                from core.services.cognito_local import LocalCognitoIdpClient
+
+                LOGGER.warning("Using the local in-process Cognito stand-in")
+                _idp_client = LocalCognitoIdpClient()
+            elif _idp_client is None:
+                LOGGER.debug("Creating the cognito-idp client . . .")
+                _idp_client = boto3.session.Session().client(
+                    "cognito-idp",
+                    region_name=settings.AWS_DEFAULT_REGION,
+                    endpoint_url=settings.COGNITO_ENDPOINT_URL,
+                    config=Config(
+                        max_pool_connections=settings.COGNITO_MAX_POOL_CONNECTIONS,
+                        tcp_keepalive=True,
+                        connect_timeout=settings.COGNITO_CONNECT_TIMEOUT,
+                        read_timeout=settings.COGNITO_READ_TIMEOUT,
+                        retries={"mode": "adaptive", "total_max_attempts": settings.COGNITO_MAX_ATTEMPTS},
+                    ),
+                )
+    return _idp_client
+
+
+_call_executor = None
+_call_executor_lock = threading.Lock()
+
+
+def _run_concurrently(*calls):
+    """
+    Makes independent Cognito calls at the same time on a small process-wide thread pool,
+    so a request waits for the slowest call instead of the sum of them.
+
+    :param calls: Functions that each make one call.
+    :return: The results of the calls, in order.
+    :raises: The exception of the first call that failed, once every call has finished.
+    """
+    global _call_executor
+    if _call_executor is None:
+        with _call_executor_lock:
+            if _call_executor is None:
+                _call_executor = ThreadPoolExecutor(
+                    max_workers=settings.COGNITO_CALL_WORKERS, thread_name_prefix="cognito-call"
+                )
+    futures = [_call_executor.submit(call) for call in calls]
+    errors = [future.exception() for future in futures]
+    for error in errors:
+        if error is not None:
+            raise error
+    return [future.result() for future in futures]
+
+
 def _cognito_username_from_email(email_address):
     return email_address.lower().replace("@", "_at_").replace(".", "dot")
 
 
+# admin_get_user results are cached under this prefix; a user that does not exist is cached
+# (for a shorter time) as _USER_NOT_FOUND so repeated existence checks stay off AWS too
+_USER_CACHE_PREFIX = "cognito-user"
+_USER_NOT_FOUND = "not-found"
+
+user_cache_stats = CacheStats(_USER_CACHE_PREFIX)
+
+
+def _user_cache_key(user_email):
+    return f"{_USER_CACHE_PREFIX}:{_cognito_username_from_email(user_email)}"
+
+
+def user_cache_metrics():
+    """
+    Returns the hit/miss counters of the admin_get_user cache.  Every hit is an AWS round
+    trip saved; ``negative_hits`` are the hits for users that do not exist.
+    """
+    metrics = user_cache_stats.as_dict("negative_hits")
+    metrics["saved_round_trips"] = metrics["hits"]
+    return metrics
+
+
 class UserExistsException(Exception):
     pass
 
@@ -39,32 +132,39 @@ class InvalidCredentialsException(Exception):
 class CognitoIdentityProviderService:
     """Encapsulates Amazon Cognito actions"""
 
-    def __new__(cls):
+    _instance_lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
         """Make this class a Singleton"""
         if not hasattr(cls, "instance"):
-            LOGGER.debug(
-                "No instance of CognitoIdentityProviderService exists - "
-                "creating new singleton instance . . ."
-            )
-            cls.instance = super().__new__(cls)
+            with cls._instance_lock:
+                if not hasattr(cls, "instance"):
+                    LOGGER.debug(
+                        "No instance of CognitoIdentityProviderService exists - "
+                        "creating new singleton instance . . ."
+                    )
+                    cls.instance = super().__new__(cls)
         return cls.instance
 
     def __init__(self, user_pool_id=None, client_id=None, client_secret=None):
         """
+        The singleton is only initialized once - arguments passed on later calls are ignored.
+
         :param user_pool_id: The ID of an existing Amazon Cognito user pool.
         :param client_id: The ID of a client application registered with the user pool.
         :param client_secret: The client secret, if the client has a secret.
         """
-        LOGGER.debug("Initializing: CognitoIdentityProviderService . . .")
-        self.cognito_idp_client = boto3.client(
-            "cognito-idp",
-            region_name=settings.AWS_DEFAULT_REGION(),
-            # aws_access_key_id=settings.get_aws_access_key_id(),
-            # aws_secret_access_key=settings.get_aws_secret_access_key(),
-        )
-        self.user_pool_id = user_pool_id if user_pool_id else settings.COGNITO_USER_POOL_ID()
-        self.client_id = client_id = client_id if client_id else settings.COGNITO_CLIENT_ID()
-        self.client_secret = client_secret
+        if getattr(self, "_initialized", False):
+            return
+        with self._instance_lock:
+            if getattr(self, "_initialized", False):
+                return
+            LOGGER.debug("Initializing: CognitoIdentityProviderService . . .")
+            self.cognito_idp_client = _cognito_idp_client()
+            self.user_pool_id = user_pool_id if user_pool_id else settings.COGNITO_USER_POOL_ID
+            self.client_id = client_id if client_id else settings.COGNITO_CLIENT_ID
+            self.client_secret = client_secret if client_secret else settings.COGNITO_CLIENT_SECRET
+            self._initialized = True
 
     def sign_up_user(self, user_email, password):
         try:
@@ -92,6 +192,8 @@ class CognitoIdentityProviderService:
             else:
                 LOGGER.exception(f"Couldn't sign up {user_email}")
             raise
+        finally:
+            self.invalidate_cached_user(user_email)
 
     def forgot_password(self, user_email):
         try:
@@ -140,19 +242,27 @@ class CognitoIdentityProviderService:
             else:
                 LOGGER.exception(f"Couldn't reset password for {user_email}")
             raise
+        finally:
+            self.invalidate_cached_user(user_email)
 
     def admin_confirm_sign_up(self, user_email):
-        email_verification_response = self.cognito_idp_client.admin_update_user_attributes(
-            UserPoolId=self.user_pool_id,
-            Username=_cognito_username_from_email(user_email),
-            UserAttributes=[
-                {"Name": "email_verified", "Value": "true"},
-            ],
-        )
-
-        confirm_sign_up_response = self.cognito_idp_client.admin_confirm_sign_up(
-            UserPoolId=self.user_pool_id, Username=_cognito_username_from_email(user_email)
-        )
+        username = _cognito_username_from_email(user_email)
+        try:
+            # Marking the email verified and confirming the user are independent - make both calls at once
+            email_verification_response, confirm_sign_up_response = _run_concurrently(
+                lambda: self.cognito_idp_client.admin_update_user_attributes(
+                    UserPoolId=self.user_pool_id,
+                    Username=username,
+                    UserAttributes=[
+                        {"Name": "email_verified", "Value": "true"},
+                    ],
+                ),
+                lambda: self.cognito_idp_client.admin_confirm_sign_up(
+                    UserPoolId=self.user_pool_id, Username=username
+                ),
+            )
+        finally:
+            self.invalidate_cached_user(user_email)
 
         return (
             confirm_sign_up_response["ResponseMetadata"]["HTTPStatusCode"] == 200
@@ -160,21 +270,48 @@ class CognitoIdentityProviderService:
         )
 
     def admin_get_user(self, user_email):
+        """
+        Gets a user from the user pool, reading through a cache of recent results.
+
+        Users are cached for COGNITO_USER_CACHE_TIMEOUT seconds, and users that do not exist
+        for COGNITO_USER_NOT_FOUND_CACHE_TIMEOUT seconds.  sign_up_user,
+        admin_confirm_sign_up and reset_password invalidate the cached user.
+
+        :param user_email: The email address of the user.
+        :return: The admin_get_user response.
+        :raises UserDoesNotExistException: If the user does not exist.
+        """
+        key = _user_cache_key(user_email)
+        cached = cache.get(key)
+        if cached is not None:
+            user_cache_stats.hit()
+            if cached == _USER_NOT_FOUND:
+                user_cache_stats.increment("negative_hits")
+                raise UserDoesNotExistException(f"User {user_email} does not exist.")
+            return cached
+        user_cache_stats.miss()
+
         LOGGER.info(f"Getting user in admin_get_user: email=> '{user_email}' ")
         try:
             response = self.cognito_idp_client.admin_get_user(
                 UserPoolId=self.user_pool_id, Username=_cognito_username_from_email(user_email)
             )
+            cache.set(key, response, settings.COGNITO_USER_CACHE_TIMEOUT)
             return response
         except ClientError as err:
             LOGGER.warning(f"Error Code: {err.response['Error']['Code']}")
             LOGGER.warning(f"Full Error: {err.response}")
             if err.response["Error"]["Code"] == "UserNotFoundException":
+                cache.set(key, _USER_NOT_FOUND, settings.COGNITO_USER_NOT_FOUND_CACHE_TIMEOUT)
                 raise UserDoesNotExistException(err.response["Error"]["Message"])
             else:
                 LOGGER.exception(f"Couldn't get user {user_email}")
             raise
 
+    def invalidate_cached_user(self, user_email):
+        """Drops the cached admin_get_user result for a user whose state has changed."""
+        cache.delete(_user_cache_key(user_email))
+
     def confirm_sign_up(self, user_email, confirmation_code):
         try:
             kwargs = {
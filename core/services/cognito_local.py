@@ -0,0 +1,163 @@
+"""
+In-process stand-in for the Amazon Cognito user pool API.
+
+With ``COGNITO_BACKEND = "local"`` the Cognito service talks to ``LocalCognitoIdpClient``
+instead of AWS, so the sign up, confirm email and password reset flows can be run and load
+tested with ``USE_COGNITO`` on but no AWS account.  It implements the cognito-idp calls the
+service makes, with the same response shapes and ``ClientError`` codes, and sleeps for
+``COGNITO_LOCAL_LATENCY`` seconds per call to stand in for the AWS round trip.
+
+Users are kept in memory, so each process has its own user pool.
+"""
+import hashlib
+import secrets
+import threading
+import time
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+
+MIN_PASSWORD_LENGTH = 8
+
+
+def _ok(**response):
+    response["ResponseMetadata"] = {"HTTPStatusCode": 200}
+    return response
+
+
+def _error(operation_name, code, message):
+    return ClientError({"Error": {"Code": code, "Message": message}, "ResponseMetadata": {"HTTPStatusCode": 400}},
+                       operation_name)
+
+
+def _hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+class LocalCognitoIdpClient:
+    """Implements the cognito-idp client calls used by CognitoIdentityProviderService in memory."""
+
+    def __init__(self, latency=None):
+        """
+        :param latency: Seconds each call takes. Defaults to COGNITO_LOCAL_LATENCY.
+        """
+        self.latency = settings.COGNITO_LOCAL_LATENCY if latency is None else latency
+        self.users = {}
+        self.access_tokens = {}
+        self.lock = threading.Lock()
+
+    def _call(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _user(self, operation_name, username):
+        user = self.users.get(username)
+        if user is None:
+            raise _error(operation_name, "UserNotFoundException", "User does not exist.")
+        return user
+
+    def _check_password(self, operation_name, password):
+        if len(password or "") < MIN_PASSWORD_LENGTH:
+            raise _error(
+                operation_name,
+                "InvalidPasswordException",
+                f"Password did not conform with policy: Password not long enough ({MIN_PASSWORD_LENGTH})",
+            )
+
+    def sign_up(self, ClientId, Username, Password, UserAttributes=(), SecretHash=None):
+        self._call()
+        self._check_password("SignUp", Password)
+        with self.lock:
+            if Username in self.users:
+                raise _error("SignUp", "UsernameExistsException", "User already exists")
+            self.users[Username] = {
+                "password": _hash_password(Password),
+                "attributes": {attribute["Name"]: attribute["Value"] for attribute in UserAttributes},
+                "status": "UNCONFIRMED",
+                "sub": secrets.token_hex(16),
+            }
+            return _ok(UserConfirmed=False, UserSub=self.users[Username]["sub"])
+
+    def admin_get_user(self, UserPoolId, Username):
+        self._call()
+        with self.lock:
+            user = self._user("AdminGetUser", Username)
+            return _ok(
+                Username=Username,
+                UserAttributes=[{"Name": name, "Value": value} for name, value in user["attributes"].items()],
+                UserStatus=user["status"],
+                Enabled=True,
+            )
+
+    def admin_update_user_attributes(self, UserPoolId, Username, UserAttributes):
+        self._call()
+        with self.lock:
+            user = self._user("AdminUpdateUserAttributes", Username)
+            user["attributes"].update({attribute["Name"]: attribute["Value"] for attribute in UserAttributes})
+            return _ok()
+
+    def admin_confirm_sign_up(self, UserPoolId, Username):
+        self._call()
+        with self.lock:
+            self._user("AdminConfirmSignUp", Username)["status"] = "CONFIRMED"
+            return _ok()
+
+    def confirm_sign_up(self, Username, ConfirmationCode, ClientId=None, UserPoolId=None, UserAttributes=(),
+                        SecretHash=None):
+        self._call()
+        with self.lock:
+            self._user("ConfirmSignUp", Username)["status"] = "CONFIRMED"
+            return _ok()
+
+    def forgot_password(self, ClientId, Username, SecretHash=None):
+        self._call()
+        with self.lock:
+            self._user("ForgotPassword", Username)
+            return _ok(CodeDeliveryDetails={"DeliveryMedium": "EMAIL", "AttributeName": "email"})
+
+    def admin_set_user_password(self, UserPoolId, Username, Password, Permanent=False, SecretHash=None):
+        self._call()
+        self._check_password("AdminSetUserPassword", Password)
+        with self.lock:
+            user = self._user("AdminSetUserPassword", Username)
+            user["password"] = _hash_password(Password)
+            if Permanent:
+                user["status"] = "CONFIRMED"
+            return _ok()
+
+    def initiate_auth(self, ClientId, AuthFlow, AuthParameters):
+        self._call()
+        username = AuthParameters.get("USERNAME")
+        password = AuthParameters.get("PASSWORD")
+        if not username or not password:
+            raise _error("InitiateAuth", "InvalidParameterException", "Missing required parameter USERNAME or PASSWORD")
+        with self.lock:
+            user = self._user("InitiateAuth", username)
+            if user["password"] != _hash_password(password):
+                raise _error("InitiateAuth", "NotAuthorizedException", "Incorrect username or password.")
+            if user["status"] != "CONFIRMED":
+                raise _error("InitiateAuth", "UserNotConfirmedException", "User is not confirmed.")
+            access_token = secrets.token_urlsafe(32)
+            self.access_tokens[access_token] = username
+            return _ok(
+                AuthenticationResult={
+                    "AccessToken": access_token,
+                    "IdToken": secrets.token_urlsafe(32),
+                    "RefreshToken": secrets.token_urlsafe(32),
+                    "ExpiresIn": 3600,
+                    "TokenType": "Bearer",
+                }
+            )
+
+    def change_password(self, PreviousPassword, ProposedPassword, AccessToken):
+        self._call()
+        self._check_password("ChangePassword", ProposedPassword)
+        with self.lock:
+            username = self.access_tokens.get(AccessToken)
+            if username is None:
+                raise _error("ChangePassword", "NotAuthorizedException", "Invalid Access Token")
+            user = self._user("ChangePassword", username)
+            if user["password"] != _hash_password(PreviousPassword):
+                raise _error("ChangePassword", "NotAuthorizedException", "Incorrect username or password.")
+            user["password"] = _hash_password(ProposedPassword)
+            return _ok()
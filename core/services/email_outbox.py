@@ -0,0 +1,162 @@
+"""
+Durable, database-backed outbox for outbound email.
+
+When ``EMAIL_DELIVERY`` is ``"outbox"``, ``MailSender.send_email`` only inserts an
+``OutboundEmail`` row, so views such as sign up and password reset return without waiting
+on SMTP or SES.  ``manage.py send_queued_emails`` runs the worker that sends them, so the
+outbox must only be turned on where that worker is deployed alongside the web server.
+
+Each email is claimed by pushing its ``next_attempt_at`` out by the retry delay before it
+is sent, so if a worker dies mid-send the email is simply retried later, and several
+workers can run at once (on Postgres claimed rows are skipped with ``SKIP LOCKED``).
+Failed sends are retried with exponential backoff until ``EMAIL_OUTBOX_MAX_ATTEMPTS``,
+after which the email is marked failed and left in the table for inspection.
+
+Emails carry verification codes and reset links, so their bodies are cleared once they
+have been sent or given up on - only the addresses, subject and status are kept.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from core.services.email_service import SendRateLimiter, build_email_message, send_messages
+from stuco_app.models import OutboundEmail
+import logging
+import random
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+# What the body of an email is replaced with once it no longer needs to be sent
+_CLEARED_CONTENT = {"text_content": "", "html_content": ""}
+
+
+def enqueue(recipients_list, subject, text_content, html_content, from_email, reply_tos=None):
+    """
+    Queues an email to be sent by the worker.
+
+    :return: The new OutboundEmail.
+    """
+    LOGGER.info(f"Queueing email to {recipients_list} from {from_email}. . .")
+    return OutboundEmail.objects.create(
+        from_email=from_email,
+        recipients=recipients_list,
+        reply_to=reply_tos,
+        subject=subject,
+        text_content=text_content,
+        html_content=html_content,
+    )
+
+
+def enqueue_many(emails):
+    """
+    Queues many emails with a single insert.
+
+    :param emails: A list of dicts with the arguments of enqueue for each email.
+    :return: The new OutboundEmails.
+    """
+    LOGGER.info(f"Queueing {len(emails)} emails. . .")
+    return OutboundEmail.objects.bulk_create(
+        [
+            OutboundEmail(
+                from_email=email["from_email"],
+                recipients=email["recipients_list"],
+                reply_to=email.get("reply_tos"),
+                subject=email["subject"],
+                text_content=email["text_content"],
+                html_content=email["html_content"],
+            )
+            for email in emails
+        ],
+        batch_size=500,
+    )
+
+
+def retry_delay(attempts):
+    """Returns how long to wait before the next attempt after ``attempts`` attempts, with some jitter."""
+    delay = min(
+        settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.EMAIL_OUTBOX_MAX_RETRY_DELAY,
+    )
+    return timedelta(seconds=delay * random.uniform(1.0, 1.25))
+
+
+def _claim_due(batch_size):
+    """Claims up to ``batch_size`` queued emails that are due, counting the attempt about to be made."""
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.QUEUED, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        for email in emails:
+            email.attempts += 1
+            email.next_attempt_at = now + retry_delay(email.attempts)
+            OutboundEmail.objects.filter(pk=email.pk).update(
+                attempts=F("attempts") + 1,
+                next_attempt_at=email.next_attempt_at,
+            )
+    return emails
+
+
+def _record_failure(email, error):
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        LOGGER.error(f"Giving up on email {email.id} to {email.recipients} after {email.attempts} attempts")
+        OutboundEmail.objects.filter(pk=email.pk).update(
+            status=OutboundEmail.FAILED, last_error=str(error), **_CLEARED_CONTENT
+        )
+        return
+    LOGGER.warning(f"Email {email.id} to {email.recipients} failed - retrying at {email.next_attempt_at}")
+    OutboundEmail.objects.filter(pk=email.pk).update(last_error=str(error))
+
+
+def send_due(batch_size=None, limiter=None):
+    """
+    Sends the queued emails that are due, over one connection to the email backend.
+
+    :param batch_size: The maximum number of emails to send. Defaults to ``EMAIL_OUTBOX_BATCH_SIZE``.
+    :param limiter: The SendRateLimiter to pace the sends with.
+    :return: A (sent, failed) tuple with the number of emails sent and not sent.
+    """
+    emails = _claim_due(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not emails:
+        return 0, 0
+
+    messages = [
+        build_email_message(
+            email.recipients, email.subject, email.text_content, email.html_content, email.reply_to, email.from_email
+        )
+        for email in emails
+    ]
+    sent = failed = 0
+    for email, error in zip(emails, send_messages(messages, limiter=limiter)):
+        if error:
+            _record_failure(email, error)
+            failed += 1
+        else:
+            OutboundEmail.objects.filter(pk=email.pk).update(
+                status=OutboundEmail.SENT, sent_at=timezone.now(), last_error=None, **_CLEARED_CONTENT
+            )
+            sent += 1
+
+    LOGGER.info(f"Sent {sent} queued emails, {failed} failed")
+    return sent, failed
+
+
+def run(once=False):
+    """
+    Sends queued emails until interrupted, checking for new ones every ``EMAIL_OUTBOX_POLL_INTERVAL`` seconds.
+
+    :param once: Send the emails that are due and return instead of waiting for more.
+    """
+    limiter = SendRateLimiter(settings.EMAIL_SEND_RATE)
+    while True:
+        close_old_connections()
+        sent, failed = send_due(limiter=limiter)
+        if sent + failed < settings.EMAIL_OUTBOX_BATCH_SIZE:
+            # Caught up - anything else due is only queued after this
+            if once:
+                return
+            time.sleep(settings.EMAIL_OUTBOX_POLL_INTERVAL)
@@ -1,14 +1,103 @@
+import collections
 import logging
 import os
+import threading
+import time
 from email.mime.application import MIMEApplication
 
 from django.template.loader import get_template
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 
 from django.conf import settings
 
 LOGGER = logging.getLogger(__name__)
 
+LOGO_ATTACHMENT = "templates/email_templates/images/email-logo-header.jpg"
+
+_logo_part = None
+_logo_part_lock = threading.Lock()
+
+
+def _logo_attachment():
+    """
+    Returns the MIME part for the logo shown in the email header.
+
+    The image is read and encoded once per process; the same part is attached to every
+    message, which only reads it when the message is serialized.
+    """
+    global _logo_part
+    if _logo_part is not None:
+        return _logo_part
+    with _logo_part_lock:
+        if _logo_part is None:
+            with open(settings.BASE_DIR / LOGO_ATTACHMENT, "rb") as logo_file:
+                # Define the attachment part and encode it using MIMEApplication.
+                att = MIMEApplication(logo_file.read())
+
+            # Add a header to tell the email client to treat this part as an attachment,
+            # and to give the attachment a name.
+            att.add_header("Content-ID", "<stuco-logo>")
+            att.add_header("Content-Disposition", "attachment", filename=os.path.basename(LOGO_ATTACHMENT))
+            # att.set_disposition(f"inline; filename=\"{LOGO_ATTACHMENT}\"")
+            _logo_part = att
+    return _logo_part
+
+
+BulkSendResult = collections.namedtuple("BulkSendResult", ["recipient", "status", "error"])
+
+
+class SendRateLimiter:
+    """Spaces sends out so that no more than ``rate`` messages go out per second (no limit if ``rate`` is 0)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_send = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next_send > now:
+            time.sleep(self.next_send - now)
+        self.next_send = max(now, self.next_send) + self.interval
+
+
+def send_messages(messages, limiter=None):
+    """
+    Sends messages over a single connection to the email backend.
+
+    Messages are handed to the backend one at a time, so a rejected recipient only fails its
+    own message; after a failure the connection is reopened for the remaining messages.
+
+    :param messages: The EmailMessages to send.
+    :param limiter: The SendRateLimiter to pace the sends with.
+    :return: A list with, for each message, None if it was sent or the exception that
+             stopped it being sent.
+    """
+    errors = []
+    connection = get_connection()
+    try:
+        connection.open()
+        for message in messages:
+            if limiter:
+                limiter.wait()
+            try:
+                if not connection.send_messages([message]):
+                    raise ValueError("The email backend did not send the message")
+                errors.append(None)
+            except Exception as e:
+                LOGGER.warning(f"Couldn't send mail to {message.to}: {e}")
+                errors.append(e)
+                # The connection may be unusable after a failure - start a fresh one
+                connection.close()
+                connection.open()
+    except Exception as e:
+        LOGGER.exception("Unable to connect to the email backend")
+        errors.extend([e] * (len(messages) - len(errors)))
+    finally:
+        connection.close()
+    return errors
+
 
 class MailSender:
     """Encapsulates functions to send emails."""
@@ -58,6 +147,70 @@ class MailSender:
             reply_tos=reply_tos,
         )
 
+    def send_bulk_email(self, template_name, subject, recipients, from_email=None, reply_tos=None, text_content=None):
+        """
+        Sends one email to each of many recipients, rendering the template with each
+        recipient's own context.
+
+        The messages go out in batches of EMAIL_BULK_BATCH_SIZE, each batch over a single
+        connection to the email backend, at no more than EMAIL_SEND_RATE messages per second.
+        When EMAIL_DELIVERY is "outbox" they are all queued in the outbox instead.
+
+        :param template_name: The email template, e.g. "email_templates/app_registration_template.html".
+        :param subject: The subject of the emails.
+        :param recipients: A list of dicts, each with the ``email`` of one recipient plus the
+                           values the template needs for that recipient.
+        :param from_email: The source email account.
+        :param reply_tos: Email accounts that will receive a reply if a recipient replies.
+        :param text_content: The plain text version of the body. Defaults to the subject.
+        :return: A list with a BulkSendResult for each recipient, whose status is "sent",
+                 "queued" or "failed" (with the reason in ``error``).
+        """
+        if not from_email:
+            from_email = settings.SYSTEM_EMAIL_SENDER
+        text_content = text_content or subject
+        template = get_template(template_name)
+        rendered = [(recipient["email"], template.render(recipient)) for recipient in recipients]
+        LOGGER.info(f"Sending {template_name} to {len(rendered)} recipients . . .")
+
+        if settings.EMAIL_DELIVERY == "outbox":
+            from core.services import email_outbox
+
+            email_outbox.enqueue_many(
+                [
+                    {
+                        "recipients_list": [email],
+                        "subject": subject,
+                        "text_content": text_content,
+                        "html_content": html,
+                        "from_email": from_email,
+                        "reply_tos": reply_tos,
+                    }
+                    for email, html in rendered
+                ]
+            )
+            return [BulkSendResult(email, "queued", None) for email, _ in rendered]
+
+        results = []
+        limiter = SendRateLimiter(settings.EMAIL_SEND_RATE)
+        for start in range(0, len(rendered), settings.EMAIL_BULK_BATCH_SIZE):
+            batch = rendered[start:start + settings.EMAIL_BULK_BATCH_SIZE]
+            errors = send_messages(
+                [
+                    build_email_message([email], subject, text_content, html, reply_tos, from_email)
+                    for email, html in batch
+                ],
+                limiter=limiter,
+            )
+            results.extend(
+                BulkSendResult(email, "failed", str(error)) if error else BulkSendResult(email, "sent", None)
+                for (email, _), error in zip(batch, errors)
+            )
+
+        failed = sum(1 for result in results if result.status == "failed")
+        LOGGER.info(f"Sent {template_name} to {len(results) - failed} recipients, {failed} failed")
+        return results
+
     def send_email(
         self,
         recipients_list,
@@ -68,7 +221,7 @@ class MailSender:
         reply_tos=None,
     ):
         """
-        Sends an email.
+        Sends an email, or queues it in the outbox when EMAIL_DELIVERY is "outbox".
 
         Note: If your account is in the Amazon SES  sandbox, the source and
         destination email accounts must both be verified.
@@ -80,38 +233,31 @@ class MailSender:
         :param html_content: The HTML version of the body of the email.
         :param reply_tos: Email accounts that will receive a reply if the recipient
                           replies to the message.
-        :return: The ID of the message, assigned by Amazon SES.
+        :return: The ID of the message, assigned by Amazon SES, or the id of the
+                 OutboundEmail when EMAIL_DELIVERY is "outbox".
         """
-        LOGGER.info(f"Sending email to {recipients_list} from {from_email}. . .")
-        # Create the email message
         if not isinstance(recipients_list, list):
             recipients_list = [recipients_list]
 
         if not from_email:
             from_email = settings.SYSTEM_EMAIL_SENDER
 
-        email_message = EmailMultiAlternatives(
-            subject,
-            text_content,
-            'Dont Reply <do_not_reply@gmail.com>',
-            to=recipients_list,
-            reply_to=reply_tos
-        )
-        email_message.attach_alternative(html_content, "text/html")
-
-        logo_attachment = "templates/email_templates/images/email-logo-header.jpg"
-
-        # Define the attachment part and encode it using MIMEApplication.
-        att = MIMEApplication(open(logo_attachment, "rb").read())
+        if settings.EMAIL_DELIVERY == "outbox":
+            # Imported here because the outbox builds its messages with build_email_message
+            from core.services import email_outbox
 
-        # Add a header to tell the email client to treat this part as an attachment,
-        # and to give the attachment a name.
-        att.add_header("Content-ID", "<stuco-logo>")
-        att.add_header("Content-Disposition", "attachment", filename=os.path.basename(logo_attachment))
-        # att.set_disposition(f"inline; filename=\"{logo_attachment}\"")
+            queued_email = email_outbox.enqueue(
+                recipients_list=recipients_list,
+                subject=subject,
+                text_content=text_content,
+                html_content=html_content,
+                from_email=from_email,
+                reply_tos=reply_tos,
+            )
+            return queued_email.id
 
-        # Add the attachment to the parent container.
-        email_message.attach(att)
+        LOGGER.info(f"Sending email to {recipients_list} from {from_email}. . .")
+        email_message = build_email_message(recipients_list, subject, text_content, html_content, reply_tos, from_email)
         try:
             message_id = email_message.send()
         except Exception:
@@ -123,6 +269,28 @@ class MailSender:
             return message_id
 
 
+def build_email_message(recipients_list, subject, text_content, html_content, reply_tos=None, from_email=None):
+    """
+    Builds the HTML email, with the logo attached, that MailSender sends.
+
+    :param from_email: The source email account. Defaults to SYSTEM_EMAIL_SENDER.
+    :return: The EmailMultiAlternatives message.
+    """
+    # Create the email message
+    email_message = EmailMultiAlternatives(
+        subject,
+        text_content,
+        from_email or settings.SYSTEM_EMAIL_SENDER,
+        to=recipients_list,
+        reply_to=reply_tos,
+    )
+    email_message.attach_alternative(html_content, "text/html")
+
+    # Add the attachment to the parent container.
+    email_message.attach(_logo_attachment())
+    return email_message
+
+
 if __name__ == "__main__":
     import django
 
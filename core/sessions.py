@@ -0,0 +1,116 @@
+"""
+Hybrid session engine: signed cookies for anonymous users, cached database rows for logged-in ones.
+
+With ``SESSION_STORAGE = "hybrid"`` (``SESSION_ENGINE = "core.sessions"``) a session that
+does not belong to a logged-in user is kept entirely in a signed cookie, like Django's
+``signed_cookies`` engine, so anonymous visitors never cause a database write or a
+session row.  Once a user logs in the session moves to the database and is read through
+the cache, like Django's ``cached_db`` engine, so only logging in, logging out and real
+changes to the session touch the database.
+
+A save that would write the same data that was loaded is skipped, unless
+``SESSION_SAVE_EVERY_REQUEST`` is on (then the save is what extends the expiry).
+
+Cached sessions are only consistent across workers with a shared cache, so use this
+engine with a ``CACHE_BACKEND`` other than ``"locmem"``; with ``"two-level"`` the sessions
+are read from the shared cache (``SESSION_CACHE_ALIAS``), never a worker's local copy.  Anonymous cookie sessions cannot
+be revoked on the server, which is why logged-in sessions never use them.
+"""
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends import cached_db
+from django.core import signing
+
+_SIGNED_COOKIE_SALT = "django.contrib.sessions.backends.signed_cookies"
+
+
+def _is_signed(session_key):
+    # Database session keys are lowercase letters and digits, signed data always has a ":"
+    return bool(session_key) and ":" in session_key
+
+
+class SessionStore(cached_db.SessionStore):
+    """Stores anonymous sessions in a signed cookie and logged-in sessions in the cached database."""
+
+    cache_key_prefix = "core.sessions"
+
+    _loaded_payload = None
+
+    def _payload(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        if _is_signed(self._session_key):
+            try:
+                return signing.loads(
+                    self._session_key,
+                    serializer=self.serializer,
+                    max_age=self.get_session_cookie_age(),
+                    salt=_SIGNED_COOKIE_SALT,
+                )
+            except Exception:
+                # BadSignature, ValueError, or unpickling exceptions - start a new session
+                self._session_key = None
+                self.modified = True
+                return {}
+
+        if not self._session_key:
+            # No cookie yet - nothing to look up
+            return {}
+        data = super().load()
+        self._loaded_payload = self._payload(data)
+        return data
+
+    def save(self, must_create=False):
+        data = self._get_session(no_load=must_create)
+        if SESSION_KEY not in data:
+            # Anonymous - the signed data is the session key
+            if self._session_key and not _is_signed(self._session_key):
+                super().delete(self._session_key)
+            self._session_key = signing.dumps(
+                data, compress=True, salt=_SIGNED_COOKIE_SALT, serializer=self.serializer
+            )
+            self.modified = True
+            return
+
+        if _is_signed(self._session_key):
+            # Just logged in - give the session a database row under a new key
+            self._session_key = None
+        elif (
+            self._session_key
+            and not must_create
+            and not settings.SESSION_SAVE_EVERY_REQUEST
+            and self._loaded_payload is not None
+            and self._payload(data) == self._loaded_payload
+        ):
+            return
+        super().save(must_create)
+        self._loaded_payload = self._payload(data)
+
+    def create(self):
+        if SESSION_KEY in self._get_session(no_load=True):
+            super().create()
+        else:
+            # The key is made from the data when the session is saved
+            self._session_key = None
+            self.modified = True
+
+    def exists(self, session_key):
+        if _is_signed(session_key):
+            return False
+        return super().exists(session_key)
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            session_key = self._session_key
+        if not session_key or _is_signed(session_key):
+            # Cookie sessions have nothing stored on the server
+            return
+        super().delete(session_key)
+
+    def cycle_key(self):
+        if SESSION_KEY in self._get_session() and not _is_signed(self._session_key):
+            super().cycle_key()
+        else:
+            # A new signature, and a new row if the user has just logged in, is made on save
+            self.save()
@@ -28,6 +28,7 @@ APP_VERSION = app_version
 
 USE_S3_STORAGE = False
 USE_POSTGRES = False
+USE_COGNITO = False
 
 EMAIL_PROVIDER = os.environ.get("EMAIL_PROVIDER", "console")
 LOGGER.info(f"Email Provider: {EMAIL_PROVIDER}")
@@ -166,16 +167,107 @@ else:
         },
     }
 
-# CACHES dictionary which contains caching configurations.
-CACHES = {
-    # a cache alias or name. In this case, we use "default" as the alias.
-    "default": {
-        # Here, we're using the in-memory cache backend.
+# Cache backend:
+#   "locmem"      - in-process memory, so every worker has its own cache (development)
+#   "file"        - files in CACHE_FILE_LOCATION, shared by the workers on one host
+#   "db"          - the CACHE_DB_TABLE table of the default database ("manage.py createcachetable")
+#   "redis"       - the Redis server at CACHE_REDIS_URL, shared by every host
+#   "local-redis" - an in-process Redis stand-in for tests, see core.cache_local
+#   "two-level"   - an in-process LRU in front of the CACHE_SHARED_BACKEND cache, see core.cache_backends
+# Only "redis" (and "local-redis") increment counters atomically across workers, so prefer it when
+# running several workers with buffered poll votes or rate limiting.
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+CACHE_SHARED_BACKEND = os.environ.get("CACHE_SHARED_BACKEND", "redis")
+CACHE_FILE_LOCATION = os.environ.get("CACHE_FILE_LOCATION", "/var/tmp/django_cache")
+CACHE_DB_TABLE = os.environ.get("CACHE_DB_TABLE", "django_cache")
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+# Seconds each command to the local Redis stand-in takes, to stand in for the network round trip
+CACHE_LOCAL_REDIS_LATENCY = float(os.environ.get("CACHE_LOCAL_REDIS_LATENCY", "0"))
+# With "two-level", each worker keeps up to CACHE_LOCAL_MAX_ENTRIES entries in memory for at most
+# CACHE_LOCAL_TIMEOUT seconds - the longest a worker may see a value another worker has replaced
+CACHE_LOCAL_MAX_ENTRIES = int(os.environ.get("CACHE_LOCAL_MAX_ENTRIES", "1000"))
+CACHE_LOCAL_TIMEOUT = int(os.environ.get("CACHE_LOCAL_TIMEOUT", "5"))
+
+CACHE_BACKENDS = {
+    "locmem": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         # LOCATION parameter gives a unique name or identifier to this cache instance.
         "LOCATION": "cseo_data_platform-cache",
-    }
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": CACHE_FILE_LOCATION,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "db": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": CACHE_DB_TABLE,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "redis": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": CACHE_REDIS_URL,
+    },
+    "local-redis": {
+        "BACKEND": "core.cache_local.LocalRedisCache",
+        "LOCATION": "cseo_data_platform-cache",
+        "OPTIONS": {"latency": CACHE_LOCAL_REDIS_LATENCY},
+    },
 }
+
+# CACHES dictionary which contains caching configurations.
+if CACHE_BACKEND == "two-level":
+    CACHES = {
+        "default": {
+            "BACKEND": "core.cache_backends.TwoLevelCache",
+            "LOCATION": "cseo_data_platform-cache",
+            "OPTIONS": {
+                "SHARED_CACHE": "shared",
+                "MAX_ENTRIES": CACHE_LOCAL_MAX_ENTRIES,
+                "LOCAL_TIMEOUT": CACHE_LOCAL_TIMEOUT,
+            },
+        },
+        "shared": CACHE_BACKENDS[CACHE_SHARED_BACKEND],
+    }
+else:
+    CACHES = {
+        "default": CACHE_BACKENDS[CACHE_BACKEND],
+    }
+LOGGER.info(f"Cache backend: {CACHE_BACKEND}")
+# Whether every process (web workers and management commands) sees the same cache, with
+# atomic increments - required for anything that keeps state only in the cache
+CACHE_IS_SHARED = CACHE_BACKEND == "redis" or (CACHE_BACKEND == "two-level" and CACHE_SHARED_BACKEND == "redis")
+
+# Session storage: "db" stores every session in the database, "cached_db" also reads them through
+# the cache, and "hybrid" keeps anonymous sessions in a signed cookie and logged-in ones in the
+# database, read through the cache (see core.sessions).  The cached modes need a cache shared by
+# all workers, so they are only the default when the cache backend is not "locmem".
+SESSION_STORAGE = os.environ.get("SESSION_STORAGE", "db" if CACHE_BACKEND == "locmem" else "hybrid")
+SESSION_ENGINE = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "hybrid": "core.sessions",
+}[SESSION_STORAGE]
+# With "two-level", sessions are read from the shared cache directly: a worker's local copy would
+# keep a session alive there for up to CACHE_LOCAL_TIMEOUT seconds after another worker logged it out
+SESSION_CACHE_ALIAS = "shared" if CACHE_BACKEND == "two-level" else "default"
+LOGGER.info(f"Session storage: {SESSION_STORAGE}")
+# Keep flash messages in a cookie so showing them never loads or saves the session
+MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+
+# Poll vote counting mode: "immediate" writes every vote straight to the database,
+# "buffered" accumulates votes in the cache and flushes them to the database in batches.
+POLL_VOTE_COUNTING = os.environ.get("POLL_VOTE_COUNTING", "immediate")
+# When buffering, flush a poll once this many votes are pending for one of its options . . .
+POLL_VOTE_BUFFER_FLUSH_THRESHOLD = int(os.environ.get("POLL_VOTE_BUFFER_FLUSH_THRESHOLD", "50"))
+# . . . or flush all polls when this many seconds have passed since the last flush
+POLL_VOTE_BUFFER_FLUSH_INTERVAL = int(os.environ.get("POLL_VOTE_BUFFER_FLUSH_INTERVAL", "5"))
+LOGGER.info(f"Poll vote counting: {POLL_VOTE_COUNTING}")
+# How long (in seconds) poll results stay cached without being read from the database
+POLL_RESULTS_CACHE_TIMEOUT = int(os.environ.get("POLL_RESULTS_CACHE_TIMEOUT", "300"))
+# How often (in seconds) an open results page fetches the latest results
+POLL_RESULTS_REFRESH_INTERVAL = int(os.environ.get("POLL_RESULTS_REFRESH_INTERVAL", "2"))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -195,8 +287,49 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 AUTH_USER_MODEL = "users.CustomUser"
+# Length of the codes emailed to confirm an email address or reset a password, and how long
+# (in seconds) they stay valid
+CONFIRMATION_CODE_LENGTH = int(os.environ.get("CONFIRMATION_CODE_LENGTH", "7"))
+CONFIRMATION_CODE_EXPIRES = int(os.environ.get("CONFIRMATION_CODE_EXPIRES", "86400"))
+# Sign up, email confirmation and password reset attempts allowed per client IP address and
+# per email address: AUTH_RATE_LIMIT_BURST at once, refilling at AUTH_RATE_LIMIT_PER_MINUTE
+AUTH_RATE_LIMIT_PER_MINUTE = int(os.environ.get("AUTH_RATE_LIMIT_PER_MINUTE", "5"))
+AUTH_RATE_LIMIT_BURST = int(os.environ.get("AUTH_RATE_LIMIT_BURST", "10"))
+# Take the client IP address from X-Forwarded-For - only when behind a proxy that sets it
+RATE_LIMIT_USE_X_FORWARDED_FOR = os.environ.get("RATE_LIMIT_USE_X_FORWARDED_FOR", "False") == "True"
+# Last login recording: "immediate" saves the user on every login, "buffered" collects login
+# times in memory and writes them to the database in batches
+LAST_LOGIN_RECORDING = os.environ.get("LAST_LOGIN_RECORDING", "buffered")
+# When buffering, flush once this many users have logged in since the last flush . . .
+LAST_LOGIN_BUFFER_FLUSH_THRESHOLD = int(os.environ.get("LAST_LOGIN_BUFFER_FLUSH_THRESHOLD", "100"))
+# . . . or when a login arrives this many seconds after the last flush
+LAST_LOGIN_BUFFER_FLUSH_INTERVAL = int(os.environ.get("LAST_LOGIN_BUFFER_FLUSH_INTERVAL", "30"))
+LOGGER.info(f"Last login recording: {LAST_LOGIN_RECORDING}")
 AUTH_COGNITO_FIRST = False
 
+# Amazon Cognito user pool (used when USE_COGNITO is True).  COGNITO_ENDPOINT_URL points the
+# client at a different endpoint, e.g. a local stub for testing.
+COGNITO_USER_POOL_ID = os.environ.get("COGNITO_USER_POOL_ID", None)
+COGNITO_CLIENT_ID = os.environ.get("COGNITO_CLIENT_ID", None)
+COGNITO_CLIENT_SECRET = os.environ.get("COGNITO_CLIENT_SECRET", None)
+COGNITO_ENDPOINT_URL = os.environ.get("COGNITO_ENDPOINT_URL", None)
+# Cognito backend: "aws" calls the real service, "local" uses an in-process stand-in (see
+# core.services.cognito_local) that adds COGNITO_LOCAL_LATENCY seconds to every call
+COGNITO_BACKEND = os.environ.get("COGNITO_BACKEND", "aws")
+COGNITO_LOCAL_LATENCY = float(os.environ.get("COGNITO_LOCAL_LATENCY", "0.05"))
+# The Cognito client is shared by all threads of a worker process: keep enough pooled
+# connections for every thread, and fail fast (with adaptive retries) when Cognito is slow
+COGNITO_MAX_POOL_CONNECTIONS = int(os.environ.get("COGNITO_MAX_POOL_CONNECTIONS", "10"))
+COGNITO_CONNECT_TIMEOUT = float(os.environ.get("COGNITO_CONNECT_TIMEOUT", "2"))
+COGNITO_READ_TIMEOUT = float(os.environ.get("COGNITO_READ_TIMEOUT", "5"))
+COGNITO_MAX_ATTEMPTS = int(os.environ.get("COGNITO_MAX_ATTEMPTS", "3"))
+# Threads per worker process for making independent Cognito calls at the same time
+COGNITO_CALL_WORKERS = int(os.environ.get("COGNITO_CALL_WORKERS", "4"))
+# How long (in seconds) admin_get_user results are cached, and how long a user that does
+# not exist is remembered as missing
+COGNITO_USER_CACHE_TIMEOUT = int(os.environ.get("COGNITO_USER_CACHE_TIMEOUT", "60"))
+COGNITO_USER_NOT_FOUND_CACHE_TIMEOUT = int(os.environ.get("COGNITO_USER_NOT_FOUND_CACHE_TIMEOUT", "10"))
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -219,6 +352,17 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedStaticFilesStorage"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Maximum number of uploaded files written to storage at the same time by each worker process
+FILE_UPLOAD_SAVE_WORKERS = int(os.environ.get("FILE_UPLOAD_SAVE_WORKERS", "4"))
+# How long (in seconds) a presigned direct-to-S3 upload stays valid when USE_S3_STORAGE is on
+S3_DIRECT_UPLOAD_EXPIRES = int(os.environ.get("S3_DIRECT_UPLOAD_EXPIRES", "300"))
+# Thumbnails of uploaded images and PDFs: the size (in pixels) of their longest side, the number
+# of processes rendering them, and how many files can wait for a thumbnail in each worker process
+THUMBNAIL_SIZE = int(os.environ.get("THUMBNAIL_SIZE", "128"))
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", "2"))
+THUMBNAIL_QUEUE_SIZE = int(os.environ.get("THUMBNAIL_QUEUE_SIZE", "100"))
+# Maximum number of files returned by the file search
+FILE_SEARCH_LIMIT = int(os.environ.get("FILE_SEARCH_LIMIT", "20"))
 
 LOGGER.info(f"Static files will be served from: {STATIC_URL}")
 
@@ -231,7 +375,7 @@ CSRF_TRUSTED_ORIGINS = ["http://127.0.0.1:8000", "http://localhost:5085", "http:
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
 
-AWS_DEFAULT_REGION = "us-east-1"
+AWS_DEFAULT_REGION = os.environ.get("AWS_DEFAULT_REGION", "us-east-1")
 
 LOGOUT_REDIRECT_URL = "/"
 LOGIN_REDIRECT_URL = "/"
@@ -255,6 +399,26 @@ else:
     LOGGER.warning("Using Console Email")
     EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
+# Email delivery mode: "immediate" sends each email during the request, "outbox" queues it
+# in the database for the worker started with "manage.py send_queued_emails" - only use
+# "outbox" where that worker is deployed, or queued emails are never sent
+EMAIL_DELIVERY = os.environ.get("EMAIL_DELIVERY", "immediate")
+LOGGER.info(f"Email delivery: {EMAIL_DELIVERY}")
+# The outbox worker sends up to this many emails per connection to the email backend, and
+# checks for new emails this often (in seconds) when it has caught up
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get("EMAIL_OUTBOX_BATCH_SIZE", "50"))
+EMAIL_OUTBOX_POLL_INTERVAL = int(os.environ.get("EMAIL_OUTBOX_POLL_INTERVAL", "2"))
+# Failed emails are retried after EMAIL_OUTBOX_RETRY_DELAY seconds, doubling up to
+# EMAIL_OUTBOX_MAX_RETRY_DELAY, and given up on after EMAIL_OUTBOX_MAX_ATTEMPTS attempts
+EMAIL_OUTBOX_RETRY_DELAY = int(os.environ.get("EMAIL_OUTBOX_RETRY_DELAY", "30"))
+EMAIL_OUTBOX_MAX_RETRY_DELAY = int(os.environ.get("EMAIL_OUTBOX_MAX_RETRY_DELAY", "3600"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("EMAIL_OUTBOX_MAX_ATTEMPTS", "8"))
+# Bulk emails are sent over one connection per EMAIL_BULK_BATCH_SIZE messages, and bulk
+# sends and the outbox worker send at most EMAIL_SEND_RATE messages per second (0 for no
+# limit) - the default matches the starting SES sending quota
+EMAIL_BULK_BATCH_SIZE = int(os.environ.get("EMAIL_BULK_BATCH_SIZE", "100"))
+EMAIL_SEND_RATE = float(os.environ.get("EMAIL_SEND_RATE", "0" if EMAIL_PROVIDER == "console" else "14"))
+
 INTERNAL_IPS = [
     # ...
     "127.0.0.1",
@@ -31,6 +31,7 @@ urlpatterns = [
     path("accounts/", include("django.contrib.auth.urls")),
     login_path,
     path("about/", home_views.about, name="about"),
+    path("cache_stats/", home_views.cache_stats, name="cache_stats"),
     path("files/", include("file_uploads.urls")),
     path("polls/", include("polls.urls")),
     path("", home_views.home, name="home"),
@@ -1,2 +1,59 @@
+from collections import Counter
+import threading
+
+from django.core.cache import cache
+
+_INCREMENT_ATTEMPTS = 3
+
+
 def get_system_base_url(request):
     return request.build_absolute_uri("/")[:-1]
+
+
+def increment_counter(key, delta=1, timeout=None):
+    """
+    Atomically adds ``delta`` to a counter in the default cache, starting it at 0 if it is missing.
+
+    :param key: The cache key of the counter.
+    :param delta: The amount to add.
+    :param timeout: The timeout the counter is created with.
+    :return: The new value of the counter, or None if the cache kept losing it.
+    """
+    for _ in range(_INCREMENT_ATTEMPTS):
+        cache.add(key, 0, timeout=timeout)
+        try:
+            return cache.incr(key, delta)
+        except ValueError:
+            # The counter expired or was evicted between add() and incr() - add it again
+            continue
+    return None
+
+
+class CacheStats:
+    """
+    Hit/miss counters for a cache, kept in process memory so counting a lookup costs no cache
+    round trip.  Like ``TwoLevelCache.stats`` they only cover the worker process that reports them.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._counters = Counter()
+        self._lock = threading.Lock()
+
+    def increment(self, counter, delta=1):
+        with self._lock:
+            self._counters[counter] += delta
+
+    def hit(self):
+        self.increment("hits")
+
+    def miss(self):
+        self.increment("misses")
+
+    def as_dict(self, *extra_counters):
+        counters = ("hits", "misses") + extra_counters
+        with self._lock:
+            stats = {counter: self._counters[counter] for counter in counters}
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+        return stats
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import UploadedFile
+from django.template.defaultfilters import filesizeformat
+from .models import StoredBlob, UploadedFile
 
 
 # Register your models here.
@@ -12,8 +13,39 @@ class UploadedFileAdmin(admin.ModelAdmin):
     )
 
     readonly_fields = (
+        "checksum",
+        "blob",
         "created_at",
         "created_by",
         "last_updated_at",
         "last_updated_by",
     )
+
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = (
+        "checksum",
+        "file",
+        "size",
+        "ref_count",
+        "created_at",
+    )
+
+    readonly_fields = (
+        "checksum",
+        "file",
+        "size",
+        "ref_count",
+        "created_at",
+    )
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context["title"] = (
+            f"Stored blobs - deduplication has saved {filesizeformat(StoredBlob.bytes_saved())} of storage"
+        )
+        return super().changelist_view(request, extra_context=extra_context)
+
+    def has_add_permission(self, request):
+        return False
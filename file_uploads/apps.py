@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class FileUploadsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'file_uploads'
+
+    def ready(self):
+        # Connect the signal handler that restores the SQLite search index triggers
+        from . import search  # noqa: F401
+        from . import thumbnails
+
+        thumbnails.check_renderers()
@@ -0,0 +1,135 @@
+"""
+Direct browser-to-S3 uploads.
+
+When ``USE_S3_STORAGE`` is on, the upload form asks the app for a presigned POST, sends
+the file straight to the bucket, and then tells the app the upload is complete so the
+``UploadedFile`` row can be recorded.  The file bytes never pass through a gunicorn
+worker; the app only signs the upload and reads the object's metadata back.
+
+The key the browser uploads to is chosen here and handed back inside a signed token, so
+the completion step can only record objects that this app asked to be uploaded.  Each
+token can be used once: its nonce is claimed in the cache when the upload is recorded, so
+with more than one worker the cache has to be shared (``CACHE_IS_SHARED``).
+"""
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from .forms import MAX_FILE_SIZE
+from .models import UploadedFile, storage, upload_to
+import logging
+import uuid
+
+LOGGER = logging.getLogger(__name__)
+
+_TOKEN_SALT = "file_uploads.direct_upload"
+_NONCE_KEY_PREFIX = "file_uploads.direct_upload.nonce."
+
+
+class DirectUploadException(Exception):
+    pass
+
+
+def is_enabled():
+    return settings.USE_S3_STORAGE
+
+
+def _s3_client():
+    return storage.bucket.meta.client
+
+
+def create_presigned_upload(file_name, content_type, size):
+    """
+    Creates a presigned POST the browser can use to upload one file to the bucket.
+
+    :param file_name: The name of the file being uploaded.
+    :param content_type: The content type the browser will send.
+    :param size: The size of the file in bytes, as reported by the browser.
+    :return: A dict with the ``url`` and ``fields`` of the POST, and the ``token`` to
+             send back when the upload is complete.
+    :raises DirectUploadException: If the file is too large.
+    """
+    if size > MAX_FILE_SIZE:
+        raise DirectUploadException(f"File size must be less than {MAX_FILE_SIZE} bytes")
+
+    file_name = file_name.split('/')[-1]
+    key = f"{upload_to or ''}direct/{uuid.uuid4()}/{file_name}"
+    presigned_post = _s3_client().generate_presigned_post(
+        Bucket=storage.bucket_name,
+        Key=key,
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            # S3 enforces the size limit itself, whatever the browser reported
+            ["content-length-range", 1, MAX_FILE_SIZE],
+        ],
+        ExpiresIn=settings.S3_DIRECT_UPLOAD_EXPIRES,
+    )
+    return {
+        "url": presigned_post["url"],
+        "fields": presigned_post["fields"],
+        "token": signing.dumps({"key": key, "name": file_name, "nonce": uuid.uuid4().hex}, salt=_TOKEN_SALT),
+    }
+
+
+def create_presigned_uploads(files, max_files):
+    """
+    Creates the presigned POSTs for a batch of files uploaded together.
+
+    :param files: (file_name, content_type, size) for each file.
+    :param max_files: The most files that can be uploaded at once.
+    :return: A list with the presigned upload of each file, see create_presigned_upload.
+    :raises DirectUploadException: If there are no files, too many files, or a file is
+                                   too large.
+    """
+    if not files:
+        raise DirectUploadException("No files to upload")
+    if len(files) > max_files:
+        raise DirectUploadException(f"At most {max_files} files can be uploaded at once")
+    return [create_presigned_upload(file_name, content_type, size) for file_name, content_type, size in files]
+
+
+def complete_upload(token, description=None, created_by=None):
+    """
+    Records the UploadedFile for an object the browser has uploaded to the bucket.
+
+    :param token: The token returned by create_presigned_upload.
+    :param description: The description of the file.
+    :param created_by: The username of the uploader.
+    :return: The new UploadedFile.
+    :raises DirectUploadException: If the token is invalid, expired or already used, or
+                                   the object was not uploaded.
+    """
+    try:
+        upload = signing.loads(
+            token,
+            salt=_TOKEN_SALT,
+            # Allow for the time the browser needs to send the file after the POST expires
+            max_age=settings.S3_DIRECT_UPLOAD_EXPIRES * 2,
+        )
+    except signing.BadSignature:
+        raise DirectUploadException("Invalid or expired upload token")
+
+    try:
+        head = _s3_client().head_object(Bucket=storage.bucket_name, Key=upload["key"])
+    except Exception:
+        LOGGER.exception(f"Uploaded object {upload['key']} could not be found")
+        raise DirectUploadException("The file was not uploaded")
+
+    nonce_key = f"{_NONCE_KEY_PREFIX}{upload['nonce']}"
+    # Kept until the token has expired, so it cannot be used again
+    if not cache.add(nonce_key, True, timeout=settings.S3_DIRECT_UPLOAD_EXPIRES * 2):
+        raise DirectUploadException("The upload has already been recorded")
+
+    LOGGER.info(f"Recording direct upload {upload['key']} ({head['ContentLength']} bytes)")
+    try:
+        return UploadedFile.objects.create(
+            file=upload["key"],
+            original_file_name=upload["name"],
+            name=upload["name"],
+            description=description,
+            created_by=created_by,
+        )
+    except Exception:
+        # Nothing was recorded - let the upload be completed again
+        cache.delete(nonce_key)
+        raise
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from file_uploads import thumbnails
+from file_uploads.models import UploadedFile
+
+
+class Command(BaseCommand):
+    help = "Generates the thumbnails of uploaded files that do not have one yet"
+
+    def handle(self, *args, **options):
+        generated = 0
+        missing = UploadedFile.objects.filter(thumbnail__isnull=True) | UploadedFile.objects.filter(thumbnail="")
+        for uploaded_file in missing.iterator():
+            try:
+                if thumbnails.generate(uploaded_file):
+                    generated += 1
+            except Exception as e:
+                self.stderr.write(f"Unable to generate a thumbnail for {uploaded_file.name}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Generated {generated} thumbnails"))
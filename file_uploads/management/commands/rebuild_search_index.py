@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from file_uploads import search
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index of uploaded files"
+
+    def handle(self, *args, **options):
+        search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS("Rebuilt the file search index"))
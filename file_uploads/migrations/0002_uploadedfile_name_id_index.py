@@ -0,0 +1,21 @@
+# Generated by Django 5.0.14 on 2026-10-17 14:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_uploads', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='uploadedfile',
+            options={'ordering': ['name', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='uploadedfile',
+            index=models.Index(fields=['name', 'id'], name='uploaded_file_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-17 14:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_uploads', '0002_uploadedfile_name_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='checksum',
+            field=models.CharField(blank=True, help_text='SHA-256 of the file content', max_length=64, null=True),
+        ),
+    ]
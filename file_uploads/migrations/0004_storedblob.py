@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-17 14:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_uploads', '0003_uploadedfile_checksum'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('checksum', models.CharField(help_text='SHA-256 of the content', max_length=64, primary_key=True, serialize=False)),
+                ('file', models.FileField(upload_to='uploaded_files/blobs/')),
+                ('size', models.BigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0, help_text='Number of uploaded files using this content')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'stored_blob',
+                'db_table_comment': 'Content-addressed storage shared by uploaded files',
+            },
+        ),
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='blob',
+            field=models.ForeignKey(blank=True, help_text='Shared content of this file, when it was stored deduplicated', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='uploaded_files', to='file_uploads.storedblob'),
+        ),
+    ]
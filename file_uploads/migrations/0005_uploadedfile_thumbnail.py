@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-17 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_uploads', '0004_storedblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='thumbnail',
+            field=models.FileField(blank=True, editable=False, null=True, upload_to='uploaded_files/thumbnails/'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+from django.db import migrations
+
+# Copied from file_uploads.search as it was when this migration was written, so later
+# changes to that module do not change what this migration does
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE uploaded_file_fts USING fts5(
+        name, description,
+        content='uploaded_file', content_rowid='rowid',
+        prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER uploaded_file_fts_insert AFTER INSERT ON uploaded_file BEGIN
+        INSERT INTO uploaded_file_fts(rowid, name, description)
+        VALUES (new.rowid, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER uploaded_file_fts_delete AFTER DELETE ON uploaded_file BEGIN
+        INSERT INTO uploaded_file_fts(uploaded_file_fts, rowid, name, description)
+        VALUES ('delete', old.rowid, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER uploaded_file_fts_update AFTER UPDATE OF name, description ON uploaded_file BEGIN
+        INSERT INTO uploaded_file_fts(uploaded_file_fts, rowid, name, description)
+        VALUES ('delete', old.rowid, old.name, old.description);
+        INSERT INTO uploaded_file_fts(rowid, name, description)
+        VALUES (new.rowid, new.name, new.description);
+    END
+    """,
+    "INSERT INTO uploaded_file_fts(uploaded_file_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS uploaded_file_fts_update",
+    "DROP TRIGGER IF EXISTS uploaded_file_fts_delete",
+    "DROP TRIGGER IF EXISTS uploaded_file_fts_insert",
+    "DROP TABLE IF EXISTS uploaded_file_fts",
+]
+
+POSTGRES_CREATE = [
+    """
+    ALTER TABLE uploaded_file ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX uploaded_file_search_idx ON uploaded_file USING GIN (search_vector)",
+]
+
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS uploaded_file_search_idx",
+    "ALTER TABLE uploaded_file DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(schema_editor, statements_by_vendor):
+    for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, {"sqlite": SQLITE_CREATE, "postgresql": POSTGRES_CREATE})
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, {"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_uploads', '0005_uploadedfile_thumbnail'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
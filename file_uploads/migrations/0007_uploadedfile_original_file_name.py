@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-17 15:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_uploads', '0006_uploadedfile_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='original_file_name',
+            field=models.CharField(blank=True, editable=False, help_text='Name of the file as it was uploaded - deduplicated content is stored under its checksum', max_length=255, null=True),
+        ),
+    ]
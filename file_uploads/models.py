@@ -1,4 +1,13 @@
-from django.db import models
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from django.db import models, transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from . import thumbnails
+import logging
+import os
+import threading
 import uuid
 from storages.backends.s3boto3 import S3Boto3Storage
 from django.conf import settings
@@ -6,19 +15,127 @@ from django.conf import settings
 
 storage = None
 upload_to = "uploaded_files/"
+blob_prefix = "uploaded_files/blobs/"
+thumbnail_prefix = "uploaded_files/thumbnails/"
 
 if settings.USE_S3_STORAGE:
     storage = S3Boto3Storage()
     upload_to = None
+    blob_prefix = "blobs/"
+    thumbnail_prefix = "thumbnails/"
 
 FILE_FIELD = models.FileField(storage=storage, upload_to=upload_to)
 
+LOGGER = logging.getLogger(__name__)
+
+_save_executor = None
+_save_executor_lock = threading.Lock()
+
+
+def _get_save_executor():
+    """Returns the process-wide pool that bounds how many files are written to storage at once."""
+    global _save_executor
+    with _save_executor_lock:
+        if _save_executor is None:
+            _save_executor = ThreadPoolExecutor(
+                max_workers=settings.FILE_UPLOAD_SAVE_WORKERS,
+                thread_name_prefix="file-upload-save",
+            )
+    return _save_executor
+
+
+def _store_file(uploaded_file):
+    """Writes the content of an unsaved UploadedFile to storage, returning the stored name."""
+    field_file = uploaded_file.file
+    field_file.save(field_file.name, field_file.file, save=False)
+    return field_file.name
+
+
+def _store_blob(uploaded_file):
+    """Writes the content of an unsaved UploadedFile to its content-addressed name, returning the stored name."""
+    field_file = uploaded_file.file
+    extension = os.path.splitext(field_file.name)[1].lower()
+    blob_name = f"{blob_prefix}{uploaded_file.checksum[:2]}/{uploaded_file.checksum}{extension}"
+    return field_file.storage.save(blob_name, field_file.file)
+
+
+def _delete_stored(names):
+    for name in names:
+        try:
+            UploadedFile._meta.get_field("file").storage.delete(name)
+        except Exception:
+            LOGGER.exception(f"Unable to remove stored file {name}")
+
+
+class StoredBlob(models.Model):
+    """
+    One copy of uploaded content, stored under its SHA-256 and shared by every
+    UploadedFile with the same content.
+    """
+
+    checksum = models.CharField(max_length=64, primary_key=True, help_text="SHA-256 of the content")
+    file = models.FileField(storage=storage, upload_to=blob_prefix)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0, help_text="Number of uploaded files using this content")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'stored_blob'
+        db_table_comment = "Content-addressed storage shared by uploaded files"
+
+    def __str__(self):
+        return self.checksum
+
+    @classmethod
+    def bytes_saved(cls):
+        """Returns the number of storage bytes saved by sharing content between uploaded files."""
+        return cls.objects.filter(ref_count__gt=1).aggregate(
+            saved=Sum((F("ref_count") - 1) * F("size"))
+        )["saved"] or 0
+
+    @classmethod
+    def release(cls, checksum):
+        """
+        Drops one reference to a blob, deleting the blob and its stored content once the
+        last uploaded file using it is gone.
+
+        :return: True if the blob was deleted, False if other files still use it.
+        """
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(pk=checksum).first()
+            if blob is None:
+                return True
+            if blob.ref_count > 1:
+                cls.objects.filter(pk=checksum).update(ref_count=F("ref_count") - 1)
+                return False
+            blob_name = blob.file.name
+            blob.delete()
+            transaction.on_commit(lambda: _delete_stored([blob_name]))
+            return True
+
 
 class UploadedFile(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     file = FILE_FIELD
+    original_file_name = models.CharField(
+        max_length=255,
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Name of the file as it was uploaded - deduplicated content is stored under its checksum",
+    )
+    checksum = models.CharField(max_length=64, blank=True, null=True, help_text="SHA-256 of the file content")
+    blob = models.ForeignKey(
+        StoredBlob,
+        blank=True,
+        null=True,
+        on_delete=models.PROTECT,
+        related_name="uploaded_files",
+        help_text="Shared content of this file, when it was stored deduplicated",
+    )
+    thumbnail = models.FileField(storage=storage, upload_to=thumbnail_prefix, blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     last_updated_at = models.DateTimeField(auto_now=True)
     created_by = models.CharField(max_length=255, blank=True, null=True)
@@ -27,8 +144,143 @@ class UploadedFile(models.Model):
     class Meta:
         db_table = 'uploaded_file'
         db_table_comment = "Table to store uploaded files"
-        ordering = ["name"]
+        ordering = ["name", "id"]
+        indexes = [
+            # Supports the keyset pagination of the file list, which is ordered by (name, id)
+            models.Index(fields=["name", "id"], name="uploaded_file_name_id_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def file_name(self):
+        """Returns the name the file was uploaded with, falling back to the name it is stored under."""
+        return self.original_file_name or self.file.name.split('/')[-1]
+
+    @classmethod
+    def bulk_save(cls, uploaded_files):
+        """
+        Saves new UploadedFiles: their content is written to storage concurrently on a
+        bounded thread pool and their rows are inserted with a single bulk INSERT.
+
+        Files with a checksum are deduplicated - content that is already stored is not
+        written again, and the file shares the existing StoredBlob instead.  The name each
+        file was uploaded with is kept in ``original_file_name``.
+
+        Either every file is saved or none is - if any storage write or the insert fails,
+        the content already written to storage is deleted and the error is raised.
+
+        :param uploaded_files: Unsaved UploadedFile instances with their ``file`` set.
+        :return: The saved UploadedFile instances.
+        """
+        for uploaded_file in uploaded_files:
+            if not uploaded_file.original_file_name:
+                uploaded_file.original_file_name = uploaded_file.file.name.split('/')[-1]
+
+        references = Counter(uploaded_file.checksum for uploaded_file in uploaded_files if uploaded_file.checksum)
+        existing_checksums = set(StoredBlob.objects.filter(pk__in=references).values_list("pk", flat=True))
+
+        new_blob_files = {}
+        futures = []
+        for uploaded_file in uploaded_files:
+            if not uploaded_file.checksum:
+                futures.append((None, _get_save_executor().submit(_store_file, uploaded_file)))
+            elif uploaded_file.checksum not in existing_checksums and uploaded_file.checksum not in new_blob_files:
+                new_blob_files[uploaded_file.checksum] = uploaded_file
+                futures.append((uploaded_file.checksum, _get_save_executor().submit(_store_blob, uploaded_file)))
+
+        stored_names = []
+        new_blob_names = {}
+        errors = []
+        for checksum, future in futures:
+            try:
+                stored_name = future.result()
+                stored_names.append(stored_name)
+                if checksum:
+                    new_blob_names[checksum] = stored_name
+            except Exception as e:
+                errors.append(e)
+
+        try:
+            if errors:
+                raise errors[0]
+            with transaction.atomic():
+                if references:
+                    StoredBlob.objects.bulk_create(
+                        [
+                            StoredBlob(checksum=checksum, file=stored_name, size=new_blob_files[checksum].file.size)
+                            for checksum, stored_name in new_blob_names.items()
+                        ],
+                        ignore_conflicts=True,
+                    )
+                    # Locking the blobs keeps StoredBlob.release from deleting them until the files are saved
+                    blob_names = dict(
+                        StoredBlob.objects.select_for_update().filter(pk__in=references).values_list("pk", "file")
+                    )
+                    released = [checksum for checksum in references if checksum not in blob_names]
+                    if released:
+                        # Blobs that were stored when the upload started have been deleted since -
+                        # store the content again
+                        LOGGER.info(f"Storing {len(released)} released blobs again")
+                        for checksum in released:
+                            new_blob_files[checksum] = next(
+                                uploaded_file for uploaded_file in uploaded_files if uploaded_file.checksum == checksum
+                            )
+                            new_blob_names[checksum] = _store_blob(new_blob_files[checksum])
+                            stored_names.append(new_blob_names[checksum])
+                        StoredBlob.objects.bulk_create(
+                            [
+                                StoredBlob(
+                                    checksum=checksum,
+                                    file=new_blob_names[checksum],
+                                    size=new_blob_files[checksum].file.size,
+                                )
+                                for checksum in released
+                            ],
+                            ignore_conflicts=True,
+                        )
+                        blob_names = dict(
+                            StoredBlob.objects.select_for_update().filter(pk__in=references).values_list("pk", "file")
+                        )
+
+                    StoredBlob.objects.filter(pk__in=references).update(
+                        ref_count=F("ref_count") + Case(
+                            *[When(pk=checksum, then=Value(count)) for checksum, count in references.items()],
+                            default=Value(0),
+                        )
+                    )
+                    for uploaded_file in uploaded_files:
+                        if uploaded_file.checksum:
+                            uploaded_file.blob_id = uploaded_file.checksum
+                            uploaded_file.file = blob_names[uploaded_file.checksum]
+
+                    # Another upload may have stored the same content first - drop our copy
+                    duplicate_names = [
+                        stored_name for checksum, stored_name in new_blob_names.items()
+                        if blob_names[checksum] != stored_name
+                    ]
+                    transaction.on_commit(lambda: _delete_stored(duplicate_names))
+
+                saved_files = cls.objects.bulk_create(uploaded_files)
+                transaction.on_commit(lambda: thumbnails.schedule(saved_files))
+                return saved_files
+        except Exception:
+            LOGGER.exception(f"Unable to save {len(uploaded_files)} uploaded files - removing stored content")
+            _delete_stored(stored_names)
+            raise
+
+
+@receiver(post_save, sender=UploadedFile)
+def _schedule_thumbnail(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: thumbnails.schedule([instance]))
+
+
+@receiver(post_delete, sender=UploadedFile)
+def _release_blob(sender, instance, **kwargs):
+    content_deleted = StoredBlob.release(instance.blob_id) if instance.blob_id else True
+    # Thumbnails of deduplicated files are shared like their content
+    if content_deleted and instance.thumbnail:
+        thumbnail_name = instance.thumbnail.name
+        transaction.on_commit(lambda: _delete_stored([thumbnail_name]))
@@ -61,6 +61,9 @@ class MultipleFileField(forms.FileField):
         else:
             result = [single_file_clean(data, initial)]
 
+        if self.max_num is not None and len(result) > self.max_num:
+            raise ValidationError(f"At most {self.max_num} files can be uploaded at once")
+
         for next_result in result:
             if next_result.size > self.maximum_file_size:
                 raise ValidationError(f"File size must be less than {self.maximum_file_size} bytes")
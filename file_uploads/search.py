@@ -0,0 +1,144 @@
+"""
+Full-text search over the names and descriptions of uploaded files.
+
+The index lives in the database and is kept up to date by the database itself, so every
+way of writing ``uploaded_file`` rows (``save()``, ``bulk_create()``, ``update()``,
+deletes) is indexed incrementally:
+
+* On SQLite an FTS5 table, ``uploaded_file_fts``, indexes the table's content and is
+  maintained by triggers.  Migrations that rebuild ``uploaded_file`` drop its triggers,
+  so they are restored (and the index rebuilt) after every ``migrate``.  The index is
+  keyed by the rowid of ``uploaded_file``, which ``VACUUM`` can renumber - run
+  ``manage.py rebuild_search_index`` after a VACUUM.
+* On Postgres (``USE_POSTGRES``) a generated ``search_vector`` tsvector column with a
+  GIN index holds the indexed text.
+
+Every term of the query is matched as a prefix, so results can be shown while the user
+types, and matches in the name rank above matches in the description.  Other databases
+fall back to an unindexed ``icontains`` search.
+"""
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Q
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+from .models import UploadedFile
+import logging
+import re
+
+LOGGER = logging.getLogger(__name__)
+
+TERM_REGEX = re.compile(r"\w+")
+
+# Columns a search result needs to be listed
+RESULT_FIELDS = ("id", "name", "description", "thumbnail")
+
+# Matches in the name count this many times as much as matches in the description
+NAME_WEIGHT = 10.0
+
+SQLITE_TRIGGERS = {
+    "uploaded_file_fts_insert": """
+        CREATE TRIGGER uploaded_file_fts_insert AFTER INSERT ON uploaded_file BEGIN
+            INSERT INTO uploaded_file_fts(rowid, name, description)
+            VALUES (new.rowid, new.name, new.description);
+        END
+    """,
+    "uploaded_file_fts_delete": """
+        CREATE TRIGGER uploaded_file_fts_delete AFTER DELETE ON uploaded_file BEGIN
+            INSERT INTO uploaded_file_fts(uploaded_file_fts, rowid, name, description)
+            VALUES ('delete', old.rowid, old.name, old.description);
+        END
+    """,
+    "uploaded_file_fts_update": """
+        CREATE TRIGGER uploaded_file_fts_update AFTER UPDATE OF name, description ON uploaded_file BEGIN
+            INSERT INTO uploaded_file_fts(uploaded_file_fts, rowid, name, description)
+            VALUES ('delete', old.rowid, old.name, old.description);
+            INSERT INTO uploaded_file_fts(rowid, name, description)
+            VALUES (new.rowid, new.name, new.description);
+        END
+    """,
+}
+
+SQLITE_REBUILD_SQL = "INSERT INTO uploaded_file_fts(uploaded_file_fts) VALUES ('rebuild')"
+
+SQLITE_SEARCH_SQL = """
+    SELECT uploaded_file.id, uploaded_file.name, uploaded_file.description, uploaded_file.thumbnail
+    FROM uploaded_file_fts
+    JOIN uploaded_file ON uploaded_file.rowid = uploaded_file_fts.rowid
+    WHERE uploaded_file_fts MATCH %s
+    ORDER BY bm25(uploaded_file_fts, {name_weight}, 1.0)
+    LIMIT %s
+""".format(name_weight=NAME_WEIGHT)
+
+POSTGRES_SEARCH_SQL = """
+    SELECT id, name, description, thumbnail
+    FROM uploaded_file
+    WHERE search_vector @@ to_tsquery('simple', %s)
+    ORDER BY ts_rank(search_vector, to_tsquery('simple', %s)) DESC, name, id
+    LIMIT %s
+"""
+
+
+def _terms(query):
+    return TERM_REGEX.findall(query.lower())
+
+
+def search(query, limit=None):
+    """
+    Finds the uploaded files whose name or description has words starting with every
+    term of a query.
+
+    :param query: The text typed by the user.
+    :param limit: The maximum number of files to return. Defaults to ``FILE_SEARCH_LIMIT``.
+    :return: A list of UploadedFiles with only their id, name, description and thumbnail
+             loaded, best matches first.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+    limit = limit or settings.FILE_SEARCH_LIMIT
+
+    if connection.vendor == "sqlite":
+        fts_query = " ".join(f'"{term}"*' for term in terms)
+        return list(UploadedFile.objects.raw(SQLITE_SEARCH_SQL, [fts_query, limit]))
+
+    if connection.vendor == "postgresql":
+        ts_query = " & ".join(f"{term}:*" for term in terms)
+        return list(UploadedFile.objects.raw(POSTGRES_SEARCH_SQL, [ts_query, ts_query, limit]))
+
+    LOGGER.warning(f"No search index for {connection.vendor} - searching without one")
+    queryset = UploadedFile.objects.only(*RESULT_FIELDS)
+    for term in terms:
+        queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+    return list(queryset.order_by("name", "id")[:limit])
+
+
+def rebuild_index():
+    """Rebuilds the search index from the ``uploaded_file`` table."""
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(SQLITE_REBUILD_SQL)
+    elif connection.vendor == "postgresql":
+        # The generated column is always current - only the index can need rebuilding
+        with connection.cursor() as cursor:
+            cursor.execute("REINDEX INDEX uploaded_file_search_idx")
+
+
+@receiver(post_migrate)
+def _restore_sqlite_triggers(sender, using, **kwargs):
+    if sender.name != "file_uploads" or connections[using].vendor != "sqlite":
+        return
+
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'uploaded_file_fts'")
+        if cursor.fetchone() is None:
+            return
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'uploaded_file'")
+        missing = set(SQLITE_TRIGGERS) - {name for name, in cursor.fetchall()}
+        if not missing:
+            return
+
+        LOGGER.info(f"Restoring search index triggers {sorted(missing)} and rebuilding the index")
+        for name in missing:
+            cursor.execute(SQLITE_TRIGGERS[name])
+        cursor.execute(SQLITE_REBUILD_SQL)
@@ -1,2 +1,458 @@
+import base64
+from concurrent.futures import Future
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+import threading
+import uuid
+from unittest import mock
 
-# Create your tests here.
+from botocore.exceptions import ClientError
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopFutureHandlers
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from . import direct_upload, models, search, thumbnails
+from .forms import MAX_FILE_SIZE
+from .models import StoredBlob, UploadedFile
+from .upload_handlers import ChecksumUploadHandler
+from .views import IndexView
+
+
+class IndexViewCursorTests(TestCase):
+    def get_cursor(self, after):
+        view = IndexView()
+        view.setup(RequestFactory().get('/', {'after': after}))
+        return view.get_cursor()
+
+    def encode(self, cursor):
+        return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+    def test_valid_cursor(self):
+        pk = uuid.uuid4()
+        self.assertEqual(self.get_cursor(self.encode(['report.pdf', str(pk)])), ('report.pdf', pk))
+
+    def test_invalid_cursors_start_from_the_first_page(self):
+        for after in (
+            'not base64!',
+            self.encode('report.pdf'),
+            self.encode(['report.pdf']),
+            self.encode(['report.pdf', 'not a uuid']),
+            self.encode(['x', 1]),
+            self.encode([1, str(uuid.uuid4())]),
+            self.encode(['x', None]),
+        ):
+            with self.subTest(after=after), self.assertLogs('file_uploads.views', 'WARNING'):
+                self.assertIsNone(self.get_cursor(after))
+
+
+class ImmediateExecutor:
+    """Runs submitted calls in the calling thread, so they share the test's transaction."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+class BulkSaveTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def uploaded_file(self, name, content, checksum=True):
+        return UploadedFile(
+            file=SimpleUploadedFile(name, content),
+            checksum=hashlib.sha256(content).hexdigest() if checksum else None,
+            name=name,
+        )
+
+    def test_deduplicated_files_keep_their_original_name(self):
+        first, second = UploadedFile.bulk_save([
+            self.uploaded_file('report.pdf', b'same content'),
+            self.uploaded_file('copy of report.pdf', b'same content'),
+        ])
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertIn(first.checksum, first.file.name)
+        self.assertEqual(first.file_name, 'report.pdf')
+        self.assertEqual(second.file_name, 'copy of report.pdf')
+        self.assertEqual(StoredBlob.objects.get(pk=first.checksum).ref_count, 2)
+
+    def test_blob_released_during_the_upload_is_stored_again(self):
+        existing, = UploadedFile.bulk_save([self.uploaded_file('report.pdf', b'shared content')])
+        store_file = models._store_file
+
+        def release_blob_then_store(uploaded_file):
+            # Another request deletes the last file using the blob while this upload is being stored
+            existing.delete()
+            return store_file(uploaded_file)
+
+        with mock.patch.object(models, '_get_save_executor', return_value=ImmediateExecutor()), \
+                mock.patch.object(models, '_store_file', side_effect=release_blob_then_store):
+            saved, unchecked = UploadedFile.bulk_save([
+                self.uploaded_file('copy of report.pdf', b'shared content'),
+                self.uploaded_file('notes.txt', b'notes', checksum=False),
+            ])
+
+        blob = StoredBlob.objects.get(pk=saved.checksum)
+        self.assertEqual(blob.ref_count, 1)
+        self.assertEqual(saved.file.name, blob.file.name)
+        with saved.file.open('rb') as content:
+            self.assertEqual(content.read(), b'shared content')
+        self.assertEqual(unchecked.file_name, 'notes.txt')
+
+
+
+class DownloadTests(TestCase):
+    content = b'0123456789abcdef'
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, USE_S3_STORAGE=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        with mock.patch.object(models, '_get_save_executor', return_value=ImmediateExecutor()):
+            # Renamed for display, so the download must use the name it was uploaded with
+            self.uploaded_file, = UploadedFile.bulk_save([UploadedFile(
+                file=SimpleUploadedFile('a.txt', self.content),
+                checksum=hashlib.sha256(self.content).hexdigest(),
+                name='My notes',
+            )])
+        self.url = reverse('download_file', args=[self.uploaded_file.pk])
+        self.etag = f'"{self.uploaded_file.checksum}"'
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        self.addCleanup(response.close)
+        return response
+
+    def test_full_download(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="a.txt"')
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_byte_range(self):
+        response = self.get(Range='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/16')
+        self.assertEqual(response['Content-Length'], '4')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="a.txt"')
+        self.assertEqual(response['Content-Type'], 'text/plain')
+
+    def test_suffix_range(self):
+        response = self.get(Range='bytes=-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'def')
+        self.assertEqual(response['Content-Range'], 'bytes 13-15/16')
+
+    def test_unsatisfiable_range(self):
+        for range_header in ('bytes=16-', 'bytes=5-2', 'bytes=-0'):
+            with self.subTest(range=range_header):
+                response = self.get(Range=range_header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */16')
+
+    def test_unchanged_file_is_not_modified(self):
+        response = self.get(If_None_Match=self.etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_range(self):
+        # The range is only served if the client's copy is still current
+        response = self.get(Range='bytes=0-1', If_Range=self.etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'01')
+
+        response = self.get(Range='bytes=0-1', If_Range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+
+
+class ChecksumUploadHandlerTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        executor_patcher = mock.patch.object(models, '_get_save_executor', return_value=ImmediateExecutor())
+        executor_patcher.start()
+        self.addCleanup(executor_patcher.stop)
+
+    def receive(self, handler, name, content, chunk_size=4):
+        """Feeds a file to the handler in chunks, the way the multipart parser does."""
+        try:
+            handler.new_file('files', name, 'text/plain', len(content))
+        except StopFutureHandlers:
+            pass
+        for start in range(0, len(content), chunk_size):
+            handler.receive_data_chunk(content[start:start + chunk_size], start)
+        return handler.file_complete(len(content))
+
+    def upload(self, *files):
+        return self.client.post(reverse('upload_files'), {'files': list(files), 'description': 'Notes'})
+
+    def test_checksum_matches_the_content(self):
+        content = b'some notes'
+        response = self.upload(SimpleUploadedFile('notes.txt', content))
+
+        self.assertRedirects(response, reverse('list_files'), fetch_redirect_response=False)
+        self.assertEqual(UploadedFile.objects.get().checksum, hashlib.sha256(content).hexdigest())
+
+    def test_oversized_file_is_rejected(self):
+        with self.assertLogs('file_uploads.upload_handlers', 'WARNING'):
+            response = self.upload(SimpleUploadedFile('large.bin', b'x' * (MAX_FILE_SIZE + 1)))
+
+        self.assertContains(response, f'File size must be less than {MAX_FILE_SIZE} bytes')
+        self.assertFalse(UploadedFile.objects.exists())
+
+    def test_oversized_file_is_not_kept(self):
+        handler = ChecksumUploadHandler(max_file_size=8)
+        with self.assertLogs('file_uploads.upload_handlers', 'WARNING'):
+            uploaded_file = self.receive(handler, 'large.txt', b'0123456789')
+
+        self.assertEqual(uploaded_file.size, 10)
+        self.assertEqual(uploaded_file.read(), b'')
+        self.assertIsNone(uploaded_file.checksum)
+
+    def test_files_over_the_limit_are_not_kept_in_memory(self):
+        handler = ChecksumUploadHandler(max_files=2)
+        with self.assertLogs('file_uploads.upload_handlers', 'WARNING'):
+            uploaded_files = [self.receive(handler, f'{i}.txt', b'content %d' % i) for i in range(5)]
+
+        for uploaded_file in uploaded_files[:2]:
+            self.assertTrue(uploaded_file.read().startswith(b'content'))
+        for uploaded_file in uploaded_files[2:]:
+            self.assertEqual(uploaded_file.size, 9)
+            self.assertEqual(uploaded_file.read(), b'')
+            self.assertIsNone(uploaded_file.checksum)
+
+    def test_too_many_files_are_rejected(self):
+        with self.assertLogs('file_uploads.upload_handlers', 'WARNING'):
+            response = self.upload(*(SimpleUploadedFile(f'{i}.txt', b'notes') for i in range(4)))
+
+        self.assertContains(response, 'At most 3 files can be uploaded at once')
+        self.assertFalse(UploadedFile.objects.exists())
+
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, THUMBNAIL_SIZE=16)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def save_picture(self, name):
+        picture = io.BytesIO()
+        Image.new('RGB', (64, 32), 'red').save(picture, format='PNG')
+        with mock.patch.object(models, '_get_save_executor', return_value=ImmediateExecutor()):
+            uploaded_file, = UploadedFile.bulk_save([
+                UploadedFile(file=SimpleUploadedFile('pic.png', picture.getvalue()), name=name),
+            ])
+        return uploaded_file
+
+    def test_renamed_picture_gets_a_thumbnail(self):
+        uploaded_file = self.save_picture('Renamed picture')
+
+        thumbnail_name = thumbnails.generate(uploaded_file)
+
+        uploaded_file.refresh_from_db()
+        self.assertEqual(uploaded_file.thumbnail.name, thumbnail_name)
+        with uploaded_file.thumbnail.open('rb') as thumbnail, Image.open(thumbnail) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (16, 8)))
+
+    def test_generate_thumbnails_command(self):
+        uploaded_file = self.save_picture('Renamed picture')
+        output = io.StringIO()
+
+        call_command('generate_thumbnails', stdout=output)
+
+        self.assertIn('Generated 1 thumbnails', output.getvalue())
+        uploaded_file.refresh_from_db()
+        self.assertTrue(uploaded_file.thumbnail)
+
+    def test_files_are_skipped_when_the_queue_is_full(self):
+        pictures = [UploadedFile(name=f'Picture {i}', original_file_name=f'{i}.png') for i in range(3)]
+        dispatcher = mock.Mock()
+
+        with mock.patch.multiple(
+            thumbnails, _dispatcher=dispatcher, _queue_slots=threading.BoundedSemaphore(2), _renderers=mock.Mock()
+        ), self.assertLogs('file_uploads.thumbnails', 'WARNING') as logs:
+            thumbnails.schedule(pictures)
+
+        self.assertEqual(
+            [call.args for call in dispatcher.submit.call_args_list],
+            [(thumbnails._generate_in_background, picture) for picture in pictures[:2]],
+        )
+        self.assertEqual(logs.output, ['WARNING:file_uploads.thumbnails:Thumbnail queue is full - skipping Picture 2'])
+
+
+
+class SearchTests(TestCase):
+    def create(self, name, description=None):
+        return UploadedFile.objects.create(name=name, description=description, file=f'uploaded_files/{name}')
+
+    def names(self, query):
+        return [uploaded_file.name for uploaded_file in search.search(query)]
+
+    def test_terms_match_word_prefixes(self):
+        self.create('Budget 2024.xlsx', 'Spending plan')
+        self.create('Minutes.docx', 'Meeting of the budget committee')
+        self.create('Photos.zip', 'Spring dance')
+
+        self.assertEqual(set(self.names('bud')), {'Budget 2024.xlsx', 'Minutes.docx'})
+        self.assertEqual(self.names('budg comm'), ['Minutes.docx'])
+        self.assertEqual(self.names('udget'), [])
+        self.assertEqual(self.names('  !? '), [])
+
+    def test_name_matches_rank_first(self):
+        self.create('Agenda.pdf', 'Election budget budget budget')
+        self.create('Election results.pdf', 'Counted by the council')
+
+        self.assertEqual(self.names('election'), ['Election results.pdf', 'Agenda.pdf'])
+
+    def test_index_follows_updates_and_deletes(self):
+        uploaded_file = self.create('Draft.txt', 'First version')
+
+        UploadedFile.objects.filter(pk=uploaded_file.pk).update(name='Final.txt', description='Approved')
+        self.assertEqual(self.names('draft'), [])
+        self.assertEqual(self.names('final approved'), ['Final.txt'])
+
+        UploadedFile.objects.filter(pk=uploaded_file.pk).delete()
+        self.assertEqual(self.names('final'), [])
+
+    def test_search_files_view(self):
+        self.create('Budget 2024.xlsx', 'Spending plan')
+
+        response = self.client.get(reverse('search_files'), {'q': 'spend'})
+        self.assertContains(response, 'Budget 2024.xlsx')
+
+        response = self.client.get(reverse('search_files'), {'q': 'photos'})
+        self.assertContains(response, 'No files match "photos"')
+
+    def test_dropped_triggers_are_restored(self):
+        with connection.cursor() as cursor:
+            for name in search.SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {name}')
+        # Written while the triggers are missing, so only the rebuild can index it
+        self.create('Budget 2024.xlsx')
+        self.assertEqual(self.names('budget'), [])
+
+        with self.assertLogs('file_uploads.search', 'INFO'):
+            search._restore_sqlite_triggers(sender=apps.get_app_config('file_uploads'), using='default')
+
+        self.assertEqual(self.names('budget'), ['Budget 2024.xlsx'])
+        self.create('Minutes.docx')
+        self.assertEqual(self.names('minutes'), ['Minutes.docx'])
+
+
+class LocalS3Client:
+    """Stands in for the S3 client: keeps uploaded objects in memory and checks presigned POSTs."""
+
+    def __init__(self):
+        self.objects = {}
+        self.policies = {}
+
+    def generate_presigned_post(self, Bucket, Key, Fields, Conditions, ExpiresIn):
+        # S3 reads the conditions from the signed policy field - here it names the stored conditions
+        policy = uuid.uuid4().hex
+        self.policies[policy] = Conditions
+        return {
+            "url": f"https://{Bucket}.s3.local/",
+            "fields": {"key": Key, "policy": policy, **Fields},
+        }
+
+    def post(self, presigned_post, content):
+        """Uploads an object the way a browser would, enforcing the POST's conditions."""
+        for condition in self.policies[presigned_post["fields"]["policy"]]:
+            if isinstance(condition, list) and condition[0] == "content-length-range":
+                if not condition[1] <= len(content) <= condition[2]:
+                    return False
+        self.objects[presigned_post["fields"]["key"]] = content
+        return True
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        return {"ContentLength": len(self.objects[Key])}
+
+
+@override_settings(USE_S3_STORAGE=True)
+class DirectUploadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.s3 = LocalS3Client()
+        for patcher in (
+            mock.patch.object(direct_upload, '_s3_client', return_value=self.s3),
+            mock.patch.object(direct_upload, 'storage', mock.Mock(bucket_name='uploads')),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def presign(self, *file_names):
+        return self.client.post(reverse('direct_upload_presign'), {
+            'file_name': list(file_names),
+            'content_type': ['text/plain'] * len(file_names),
+            'size': ['5'] * len(file_names),
+        })
+
+    def complete(self, upload):
+        return self.client.post(reverse('direct_upload_complete'), {'token': upload['token'], 'description': 'Notes'})
+
+    def test_uploaded_file_is_recorded(self):
+        upload, = self.presign('notes.txt').json()['uploads']
+        self.assertTrue(self.s3.post(upload, b'notes'))
+
+        response = self.complete(upload)
+        self.assertEqual(response.status_code, 200)
+        uploaded_file = UploadedFile.objects.get(pk=response.json()['id'])
+        self.assertEqual(uploaded_file.file.name, upload['fields']['key'])
+        self.assertEqual(uploaded_file.file_name, 'notes.txt')
+
+    def test_token_can_only_be_used_once(self):
+        upload, = self.presign('notes.txt').json()['uploads']
+        self.s3.post(upload, b'notes')
+
+        self.assertEqual(self.complete(upload).status_code, 200)
+        response = self.complete(upload)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(UploadedFile.objects.count(), 1)
+
+    def test_upload_that_never_arrived_is_not_recorded(self):
+        upload, = self.presign('notes.txt').json()['uploads']
+        with self.assertLogs('file_uploads.direct_upload', 'ERROR'):
+            self.assertEqual(self.complete(upload).status_code, 400)
+
+        # The token was not used up, so the upload can be completed once the object arrives
+        self.s3.post(upload, b'notes')
+        self.assertEqual(self.complete(upload).status_code, 200)
+
+    def test_presign_enforces_max_files(self):
+        self.assertEqual(len(self.presign('1.txt', '2.txt', '3.txt').json()['uploads']), 3)
+        response = self.presign('1.txt', '2.txt', '3.txt', '4.txt')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'At most 3 files can be uploaded at once'})
+        self.assertEqual(self.presign().status_code, 400)
+
+    def test_s3_enforces_the_size_limit(self):
+        upload, = self.presign('notes.txt').json()['uploads']
+        self.assertFalse(self.s3.post(upload, b'x' * (direct_upload.MAX_FILE_SIZE + 1)))
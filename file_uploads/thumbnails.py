@@ -0,0 +1,152 @@
+"""
+Thumbnail generation for uploaded images and PDFs.
+
+Thumbnails are rendered off the request path: once a new UploadedFile is committed it is
+queued here, a dispatcher thread reads its content from storage, a process pool decodes
+and shrinks it, and the resulting JPEG is saved to storage and recorded on the row.  The
+file list then only has to emit an ``<img>`` tag pointing at the stored thumbnail.
+
+The queue is bounded by ``THUMBNAIL_QUEUE_SIZE``; files that arrive while it is full
+are skipped and can be picked up later with ``manage.py generate_thumbnails``.
+Thumbnails are stored by content checksum when there is one, so identical uploads
+share a single thumbnail.
+
+Images are rendered with Pillow and PDFs with PyMuPDF.  The renderers are spawned rather
+than forked: forking a threaded worker copies locks other threads may be holding (logging,
+database connections) into the child, which can then deadlock.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+import io
+import logging
+import multiprocessing
+import os
+import threading
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+LOGGER = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".tif", ".tiff"}
+PDF_EXTENSIONS = {".pdf"}
+
+_dispatcher = None
+_renderers = None
+_queue_slots = None
+_setup_lock = threading.Lock()
+
+
+def can_render(file_name):
+    extension = os.path.splitext(file_name)[1].lower()
+    return (extension in IMAGE_EXTENSIONS and Image is not None) or (extension in PDF_EXTENSIONS and fitz is not None)
+
+
+def check_renderers():
+    """Logs an error at startup when a dependency thumbnails are rendered with is not installed."""
+    missing = [package for package, module in (("Pillow", Image), ("PyMuPDF", fitz)) if module is None]
+    if missing:
+        LOGGER.error(f"{' and '.join(missing)} not installed - thumbnails will not be made for those files")
+
+
+def render_thumbnail(data, file_name, size):
+    """
+    Renders a JPEG thumbnail that fits in a ``size`` x ``size`` box.
+
+    Runs in the process pool, so it only takes and returns plain bytes.
+
+    :return: The JPEG bytes, or None if the file cannot be rendered.
+    """
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension in PDF_EXTENSIONS:
+        with fitz.open(stream=data, filetype="pdf") as document:
+            if not document.page_count:
+                return None
+            data = document[0].get_pixmap().tobytes("png")
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("RGB", (size, size))
+        image = image.convert("RGB")
+        image.thumbnail((size, size))
+        thumbnail = io.BytesIO()
+        image.save(thumbnail, format="JPEG", quality=80)
+        return thumbnail.getvalue()
+
+
+def _thumbnail_name(uploaded_file):
+    return f"{uploaded_file.thumbnail.field.upload_to}{uploaded_file.checksum or uploaded_file.id}.jpg"
+
+
+def generate(uploaded_file, renderer=None):
+    """
+    Creates (or reuses) the thumbnail for an UploadedFile and records it on the row.
+
+    :param uploaded_file: The UploadedFile.
+    :param renderer: A process pool to render in. Renders in this process when omitted.
+    :return: The name of the stored thumbnail, or None if none could be made.
+    """
+    from .models import UploadedFile
+
+    # The display name can be edited freely, the name the file was uploaded with keeps its extension
+    if not can_render(uploaded_file.file_name):
+        return None
+
+    storage = uploaded_file.file.storage
+    thumbnail_name = _thumbnail_name(uploaded_file)
+    if not storage.exists(thumbnail_name):
+        with uploaded_file.file.open("rb") as file:
+            data = file.read()
+        args = (data, uploaded_file.file_name, settings.THUMBNAIL_SIZE)
+        thumbnail = renderer.submit(render_thumbnail, *args).result() if renderer else render_thumbnail(*args)
+        if thumbnail is None:
+            return None
+        stored_name = storage.save(thumbnail_name, ContentFile(thumbnail))
+        if stored_name != thumbnail_name:
+            # Another worker stored the shared thumbnail first - use that one
+            storage.delete(stored_name)
+
+    UploadedFile.objects.filter(pk=uploaded_file.pk).update(thumbnail=thumbnail_name)
+    return thumbnail_name
+
+
+def _generate_in_background(uploaded_file):
+    try:
+        generate(uploaded_file, renderer=_renderers)
+    except Exception:
+        LOGGER.exception(f"Unable to generate a thumbnail for {uploaded_file.name}")
+    finally:
+        _queue_slots.release()
+        close_old_connections()
+
+
+def schedule(uploaded_files):
+    """Queues thumbnail generation for newly saved UploadedFiles."""
+    global _dispatcher, _renderers, _queue_slots
+
+    uploaded_files = [uploaded_file for uploaded_file in uploaded_files if can_render(uploaded_file.file_name)]
+    if not uploaded_files:
+        return
+
+    with _setup_lock:
+        if _dispatcher is None:
+            _queue_slots = threading.BoundedSemaphore(settings.THUMBNAIL_QUEUE_SIZE)
+            _renderers = ProcessPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _dispatcher = ThreadPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS, thread_name_prefix="thumbnails")
+
+    for uploaded_file in uploaded_files:
+        if not _queue_slots.acquire(blocking=False):
+            LOGGER.warning(f"Thumbnail queue is full - skipping {uploaded_file.name}")
+            continue
+        _dispatcher.submit(_generate_in_background, uploaded_file)
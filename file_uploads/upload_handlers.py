@@ -0,0 +1,77 @@
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+from .forms import MAX_FILE_SIZE
+import hashlib
+import io
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ChecksumUploadHandler(FileUploadHandler):
+    """
+    Receives uploaded files into memory, enforcing the maximum file size and computing
+    a SHA-256 checksum while the bytes arrive.
+
+    Django's default handlers spool anything over 2.5MB to a temporary file and only let
+    the form check the size once the whole file is on disk.  Since uploads are capped at
+    ``MAX_FILE_SIZE`` this handler keeps every accepted file in memory, so it is saved to
+    the configured storage without a temporary file round trip.  As soon as a file goes
+    over the limit its buffered bytes are dropped and the rest of it is discarded as it
+    arrives; the file is then handed to the form with its real size (and no content) so
+    the form rejects it with its usual message.
+
+    Only the first ``max_files`` files of a request are buffered, and every file after them
+    is discarded the same way, so a request holds at most ``max_files * max_file_size``
+    bytes in memory whatever ``DATA_UPLOAD_MAX_NUMBER_FILES`` allows; the form rejects
+    the request for having too many files.
+
+    Accepted files get a ``checksum`` attribute with the hex SHA-256 of their content.
+    """
+
+    def __init__(self, request=None, max_file_size=MAX_FILE_SIZE, max_files=1):
+        super().__init__(request)
+        self.max_file_size = max_file_size
+        self.max_files = max_files
+        self.file_count = 0
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file_count += 1
+        self.file = io.BytesIO()
+        self.sha256 = hashlib.sha256()
+        self.received = 0
+        self.too_large = False
+        self.discarded = self.file_count > self.max_files
+        if self.discarded and self.file_count == self.max_files + 1:
+            LOGGER.warning(f"Upload has more than {self.max_files} files - discarding the rest")
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.too_large or self.discarded:
+            return None
+
+        if self.received > self.max_file_size:
+            LOGGER.warning(f"Upload {self.file_name} is larger than {self.max_file_size} bytes - discarding it")
+            self.too_large = True
+            self.file = io.BytesIO()
+            return None
+
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        uploaded_file = InMemoryUploadedFile(
+            file=self.file,
+            field_name=self.field_name,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+        uploaded_file.checksum = None if self.too_large or self.discarded else self.sha256.hexdigest()
+        return uploaded_file
@@ -6,6 +6,10 @@ urlpatterns = [
     path('edit/<str:pk>/', views.edit, name='edit_file'),
     path('create/', views.file_upload, kwargs={"max_files": 3}, name='upload_files'),
     path('upload_modal/', views.file_upload_modal, kwargs={"max_files": 3}, name='upload_files_modal'),
+    path('direct_upload/presign/', views.direct_upload_presign, kwargs={"max_files": 3}, name='direct_upload_presign'),
+    path('direct_upload/complete/', views.direct_upload_complete, name='direct_upload_complete'),
+    path('search/', views.search, name='search_files'),
+    path('download/<uuid:pk>/', views.download, name='download_file'),
     path('delete/<str:pk>/', views.delete, name='delete_file'),
     path('file_list_modal', views.IndexView.as_view(modal=True), name='file_list_modal'),
     path('', views.IndexView.as_view(), name='list_files'),
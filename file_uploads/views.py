@@ -1,12 +1,29 @@
 from .models import UploadedFile
 from .forms import UploadedFileForm
-from django.http import HttpResponse
+from .upload_handlers import ChecksumUploadHandler
+from . import direct_upload
+from . import search as file_search
+from django.conf import settings
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, quote_etag
+from django.views.decorators.http import require_GET, require_POST
 from django.views.generic import ListView
+import base64
+import json
 import logging
+import mimetypes
+import re
+import uuid
 
 LOGGER = logging.getLogger(__name__)
 
+RANGE_HEADER_REGEX = re.compile(r"^bytes=(\d*)-(\d*)$")
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
 
 class IndexView(ListView):
     def __init__(self, *args, **kwargs):
@@ -15,15 +32,54 @@ class IndexView(ListView):
 
     model = UploadedFile
     template_name = 'file_uploads/index.html'
+    rows_template_name = 'file_uploads/partials/file_rows.html'
     context_object_name = 'files'
     modal = False
+    page_size = 50
+
+    def get_cursor(self):
+        """Returns the (name, id) of the last file on the previous page, or None for the first page."""
+        after = self.request.GET.get('after')
+        if not after:
+            return None
+        try:
+            name, pk = json.loads(base64.urlsafe_b64decode(after.encode()))
+            if not isinstance(name, str) or not isinstance(pk, str):
+                raise TypeError("The cursor must be a file name and id")
+            return name, uuid.UUID(pk)
+        except (ValueError, TypeError):
+            LOGGER.warning(f"Ignoring invalid file list cursor: {after}")
+            return None
 
     def get_queryset(self):
-        return UploadedFile.objects.all()
+        # Keyset pagination: seek past the last (name, id) shown instead of using OFFSET,
+        # so every page is an index range scan no matter how deep into the list it is
+        queryset = UploadedFile.objects.only('id', 'name', 'description', 'thumbnail').order_by('name', 'id')
+        cursor = self.get_cursor()
+        if cursor:
+            name, pk = cursor
+            queryset = queryset.filter(Q(name__gt=name) | Q(name=name, id__gt=pk))
+        files = list(queryset[:self.page_size + 1])
+
+        self.next_cursor = None
+        if len(files) > self.page_size:
+            files = files[:self.page_size]
+            last_file = files[-1]
+            self.next_cursor = base64.urlsafe_b64encode(
+                json.dumps([last_file.name, str(last_file.id)]).encode()
+            ).decode()
+        return files
+
+    def get_template_names(self):
+        # HTMX "load more" requests only need the next page of table rows
+        if self.request.htmx and self.request.GET.get('after'):
+            return [self.rows_template_name]
+        return super().get_template_names()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs) # get the default context data
         context['modal'] = self.modal  # add extra field to the context
+        context['next_cursor'] = self.next_cursor
         return context
 
 
@@ -52,25 +108,41 @@ def file_upload_modal(request, max_files=5, min_files=1):
     )
 
 
+@csrf_exempt
 def file_upload(request, max_files=5, min_files=1, modal=False):
+    # Upload handlers have to be replaced before CSRF checking reads the request body,
+    # so CSRF is checked by _file_upload instead
+    request.upload_handlers = [ChecksumUploadHandler(request, max_files=max_files)]
+    return _file_upload(request, max_files=max_files, min_files=min_files, modal=modal)
+
+
+@csrf_protect
+def _file_upload(request, max_files=5, min_files=1, modal=False):
     if request.method == 'POST':
 
         form = UploadedFileForm(request.POST, request.FILES, max_files=max_files, min_files=min_files)
         if form.is_valid():
             form.save(commit=False)
+            new_uploaded_files = []
             next_file_number = 0
             for next_file in request.FILES.getlist('files'):
                 next_file_number += 1
-                next_uploaded_file = UploadedFile(
+                new_uploaded_files.append(UploadedFile(
                     file=next_file,
+                    checksum=getattr(next_file, 'checksum', None),
                     name=next_file.name.split('/')[-1],
                     description=(
                         f"{form.cleaned_data['description'] if form.cleaned_data['description'] else 'N/A'}"
                         f"-{next_file_number}"
                     ),
                     created_by=request.user.username
-                )
-                next_uploaded_file.save()
+                ))
+            try:
+                UploadedFile.bulk_save(new_uploaded_files)
+            except Exception:
+                form.add_error(None, "Unable to save the uploaded files.  Please try again.")
+                return render(request, 'file_uploads/upload_file_form.html', {'form': form, 'modal': modal})
+
             if modal:
                 return HttpResponse(status=200, headers={'HX-Trigger': 'fileListChanged'})
 
@@ -80,14 +152,61 @@ def file_upload(request, max_files=5, min_files=1, modal=False):
 
     # This is a Get Request - initial load of form . . .
     form = UploadedFileForm(max_files=max_files, min_files=min_files)
-    return render(request, 'file_uploads/upload_file_form.html', {'form': form, 'modal': modal})
+    return render(
+        request,
+        'file_uploads/upload_file_form.html',
+        {'form': form, 'modal': modal, 'direct_upload': direct_upload.is_enabled()}
+    )
+
+
+@require_POST
+def direct_upload_presign(request, max_files=5):
+    if not direct_upload.is_enabled():
+        raise Http404('Direct uploads are not enabled')
+
+    # One file_name, content_type and size per file, in the same order
+    file_names = request.POST.getlist('file_name')
+    content_types = request.POST.getlist('content_type')
+    sizes = request.POST.getlist('size')
+    if len(sizes) != len(file_names) or len(content_types) != len(file_names):
+        return JsonResponse({'error': 'file_name, content_type and size are required for every file'}, status=400)
+
+    try:
+        presigned_uploads = direct_upload.create_presigned_uploads(
+            [
+                (file_name, content_type or 'application/octet-stream', int(size))
+                for file_name, content_type, size in zip(file_names, content_types, sizes)
+            ],
+            max_files=max_files,
+        )
+    except ValueError:
+        return JsonResponse({'error': 'size must be a number'}, status=400)
+    except direct_upload.DirectUploadException as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'uploads': presigned_uploads})
+
+
+@require_POST
+def direct_upload_complete(request):
+    if not direct_upload.is_enabled():
+        raise Http404('Direct uploads are not enabled')
+
+    try:
+        uploaded_file = direct_upload.complete_upload(
+            request.POST.get('token', ''),
+            description=request.POST.get('description') or 'N/A',
+            created_by=request.user.username,
+        )
+    except direct_upload.DirectUploadException as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'id': str(uploaded_file.id)}, headers={'HX-Trigger': 'fileListChanged'})
 
 
 def edit(request, pk, template_name='file_uploads/edit.html'):
     uploaded_file = get_object_or_404(UploadedFile, pk=pk)
     if request.method == 'POST':
         # If user chose to not enter a name, use the file name
-        request.POST = _ensure_file_name(request, default_name=uploaded_file.file.name.split('/')[-1])
+        request.POST = _ensure_file_name(request, default_name=uploaded_file.file_name)
 
         form = UploadedFileForm(request.POST, instance=uploaded_file)
 
@@ -95,7 +214,7 @@ def edit(request, pk, template_name='file_uploads/edit.html'):
             uploaded_file = form.save(commit=False)
             uploaded_file.name = (
                 request.POST['file_name_from_user'] if request.POST['file_name_from_user']
-                else uploaded_file.file.name.split('/')[-1]
+                else uploaded_file.file_name
             )
             uploaded_file.save()
             return redirect('list_files')
@@ -110,7 +229,7 @@ def edit(request, pk, template_name='file_uploads/edit.html'):
         {
             'form': form,
             'uploaded_file_name_from_user': uploaded_file.name,
-            'uploaded_file_internal_file_name': uploaded_file.file.name.split('/')[-1],
+            'uploaded_file_internal_file_name': uploaded_file.file_name,
         }
     )
 
@@ -123,5 +242,108 @@ def delete(request, pk, template_name='file_uploads/confirm_delete.html'):
     return render(request, template_name, {'object': uploaded_file})
 
 
+@require_GET
+def search(request, template_name='partials/search_results.html'):
+    query = request.GET.get('q', '').strip()
+    return render(
+        request,
+        template_name,
+        {
+            'query': query,
+            'files': file_search.search(query) if query else [],
+        }
+    )
+
+
+def _parse_range(range_header, size):
+    """
+    Parses a single-range ``Range`` header.
+
+    :return: The inclusive (start, end) byte positions, None if the header should be
+             ignored, or False if the range cannot be satisfied.
+    """
+    match = RANGE_HEADER_REGEX.match(range_header.strip())
+    if not match or match.groups() == ('', ''):
+        # Multiple or malformed ranges - serve the whole file
+        return None
+
+    start, end = match.groups()
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _stream_range(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(DOWNLOAD_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+@require_GET
+def download(request, pk):
+    uploaded_file = get_object_or_404(
+        UploadedFile.objects.only('id', 'file', 'original_file_name', 'checksum'), pk=pk
+    )
+
+    if settings.USE_S3_STORAGE:
+        # Let the browser fetch the object from S3 with a short-lived presigned URL
+        return redirect(uploaded_file.file.storage.url(
+            uploaded_file.file.name,
+            parameters={'ResponseContentDisposition': content_disposition_header(True, uploaded_file.file_name)},
+        ))
+
+    etag = quote_etag(uploaded_file.checksum) if uploaded_file.checksum else None
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    file = uploaded_file.file.open('rb')
+    size = uploaded_file.file.size
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header and (not request.headers.get('If-Range') or request.headers['If-Range'] == etag):
+        byte_range = _parse_range(range_header, size)
+
+    if byte_range is False:
+        file.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _stream_range(file, start, end - start + 1),
+            status=206,
+            content_type=mimetypes.guess_type(uploaded_file.file_name)[0] or 'application/octet-stream',
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Disposition'] = content_disposition_header(True, uploaded_file.file_name)
+    else:
+        # FileResponse hands the file to the server's wsgi.file_wrapper (sendfile where available)
+        response = FileResponse(file, as_attachment=True, filename=uploaded_file.file_name)
+
+    response['Accept-Ranges'] = 'bytes'
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
 def demo(request, template_name='file_uploads/demo_uploads.html'):
     return render(request, template_name, {})
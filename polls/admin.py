@@ -1,3 +1,16 @@
 from django.contrib import admin
+from .models import Poll, PollOption
 
-# Register your models here.
+
+class PollOptionInline(admin.TabularInline):
+    model = PollOption
+    extra = 0
+
+
+@admin.register(Poll)
+class PollAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "question",
+    )
+    inlines = [PollOptionInline]
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class PollsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'polls'
+
+    def ready(self):
+        # Connect the signal handlers that keep cached poll results in sync
+        from . import results_cache  # noqa: F401
+        from . import vote_buffer
+
+        vote_buffer.check_configuration()
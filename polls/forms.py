@@ -1,7 +1,27 @@
+from django import forms
+from django.db import transaction
 from django.forms import ModelForm
-from .models import Poll
+from .models import Poll, PollOption
+
+OPTION_FIELDS = ['option_one', 'option_two', 'option_three']
+
 
 class CreatePollForm(ModelForm):
+    option_one = forms.CharField(max_length=30)
+    option_two = forms.CharField(max_length=30)
+    option_three = forms.CharField(max_length=30)
+
     class Meta:
         model = Poll
-        fields = ['question', 'option_one', 'option_two', 'option_three']
+        fields = ['question']
+
+    def save(self, commit=True):
+        poll = super().save(commit=False)
+        if commit:
+            with transaction.atomic():
+                poll.save()
+                PollOption.objects.bulk_create([
+                    PollOption(poll=poll, text=self.cleaned_data[field], position=position)
+                    for position, field in enumerate(OPTION_FIELDS)
+                ])
+        return poll
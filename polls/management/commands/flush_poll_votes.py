@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from polls import vote_buffer
+
+
+class Command(BaseCommand):
+    help = "Writes votes buffered in the cache to the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--every",
+            type=int,
+            help="Keep flushing every this many seconds instead of flushing once",
+        )
+
+    def handle(self, *args, **options):
+        if not options["every"]:
+            flushed = vote_buffer.flush_votes()
+            self.stdout.write(self.style.SUCCESS(f"Flushed {flushed} buffered votes"))
+            return
+
+        self.stdout.write(f"Flushing buffered votes every {options['every']} seconds . . .")
+        try:
+            while True:
+                close_old_connections()
+                vote_buffer.flush_votes()
+                time.sleep(options["every"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS("Stopped flushing buffered votes"))
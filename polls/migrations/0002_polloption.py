@@ -0,0 +1,112 @@
+# Generated by Django 5.0.7 on 2026-10-17 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+OPTION_COLUMNS = [
+    ('option_one', 'option_one_count'),
+    ('option_two', 'option_two_count'),
+    ('option_three', 'option_three_count'),
+]
+
+
+def copy_options_to_rows(apps, schema_editor):
+    Poll = apps.get_model('polls', 'Poll')
+    PollOption = apps.get_model('polls', 'PollOption')
+    db_alias = schema_editor.connection.alias
+
+    PollOption.objects.using(db_alias).bulk_create(
+        [
+            PollOption(
+                poll_id=poll.id,
+                text=getattr(poll, text_column),
+                count=getattr(poll, count_column),
+                position=position,
+            )
+            for poll in Poll.objects.using(db_alias).iterator()
+            for position, (text_column, count_column) in enumerate(OPTION_COLUMNS)
+        ],
+        batch_size=500,
+    )
+
+
+def copy_rows_to_options(apps, schema_editor):
+    Poll = apps.get_model('polls', 'Poll')
+    PollOption = apps.get_model('polls', 'PollOption')
+    db_alias = schema_editor.connection.alias
+
+    polls = {poll.id: poll for poll in Poll.objects.using(db_alias).all()}
+    for option in PollOption.objects.using(db_alias).filter(position__lt=len(OPTION_COLUMNS)):
+        text_column, count_column = OPTION_COLUMNS[option.position]
+        setattr(polls[option.poll_id], text_column, option.text)
+        setattr(polls[option.poll_id], count_column, option.count)
+
+    Poll.objects.using(db_alias).bulk_update(
+        polls.values(),
+        [column for columns in OPTION_COLUMNS for column in columns],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollOption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.CharField(max_length=30)),
+                ('count', models.IntegerField(default=0)),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('poll', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='options', to='polls.poll')),
+            ],
+            options={
+                'ordering': ['position', 'id'],
+            },
+        ),
+        migrations.RunPython(copy_options_to_rows, copy_rows_to_options),
+        # Give the old text columns a default so this migration can be reversed
+        migrations.AlterField(
+            model_name='poll',
+            name='option_one',
+            field=models.CharField(default='', max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='poll',
+            name='option_two',
+            field=models.CharField(default='', max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='poll',
+            name='option_three',
+            field=models.CharField(default='', max_length=30),
+        ),
+        migrations.RemoveField(
+            model_name='poll',
+            name='option_one',
+        ),
+        migrations.RemoveField(
+            model_name='poll',
+            name='option_one_count',
+        ),
+        migrations.RemoveField(
+            model_name='poll',
+            name='option_three',
+        ),
+        migrations.RemoveField(
+            model_name='poll',
+            name='option_three_count',
+        ),
+        migrations.RemoveField(
+            model_name='poll',
+            name='option_two',
+        ),
+        migrations.RemoveField(
+            model_name='poll',
+            name='option_two_count',
+        ),
+    ]
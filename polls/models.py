@@ -1,13 +1,62 @@
 from django.db import models
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+
+
+class PollQuerySet(models.QuerySet):
+    def with_results(self):
+        """
+        Annotates each poll with its total number of votes and prefetches its options,
+        so any number of polls and their results load in two queries.
+        """
+        return self.annotate(total_votes=Coalesce(Sum('options__count'), 0)).prefetch_related('options')
+
 
 class Poll(models.Model):
     question = models.TextField()
-    option_one = models.CharField(max_length=30)
-    option_two = models.CharField(max_length=30)
-    option_three = models.CharField(max_length=30)
-    option_one_count = models.IntegerField(default=0)
-    option_two_count = models.IntegerField(default=0)
-    option_three_count = models.IntegerField(default=0)
+
+    objects = PollQuerySet.as_manager()
 
     def total(self):
-        return self.option_one_count + self.option_two_count + self.option_three_count
+        if hasattr(self, 'total_votes'):
+            return self.total_votes
+        return self.options.aggregate(total=Coalesce(Sum('count'), 0))['total']
+
+    @staticmethod
+    def record_vote(poll_id, option_id):
+        """
+        Atomically increments the counter for the selected option.
+
+        The increment is done in the database (UPDATE ... SET count = count + 1) and
+        only touches the chosen option's row, so concurrent voters never overwrite
+        each other's votes.
+
+        :param poll_id: The id of the poll being voted on.
+        :param option_id: The id of the selected PollOption.
+        :return: True if a vote was recorded, False if the poll has no such option.
+        :raises ValueError: If the option id is not a valid id.
+        """
+        option_id = PollOption.parse_id(option_id)
+        updated = PollOption.objects.filter(pk=option_id, poll_id=poll_id).update(count=F('count') + 1)
+        return updated == 1
+
+
+class PollOption(models.Model):
+    poll = models.ForeignKey(Poll, related_name='options', on_delete=models.CASCADE)
+    text = models.CharField(max_length=30)
+    count = models.IntegerField(default=0)
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['position', 'id']
+
+    def __str__(self):
+        return self.text
+
+    @staticmethod
+    def parse_id(option_id):
+        """Converts a posted option id to an int, raising ValueError if it is not one."""
+        try:
+            return int(option_id)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid poll option: {option_id}")
@@ -0,0 +1,184 @@
+"""
+Per-poll results cache.
+
+Each poll's results are kept in the default cache as a snapshot of its question and
+options plus one counter per option.  Votes update the counters in place with
+``cache.incr`` so the snapshot never has to be recomputed while a poll is being voted
+on, and the rendered results fragment is kept next to the counters it was rendered
+from, so a refresh with no new votes is served straight from memory - or, when the page
+already shows those results, answered with a 304 (see ``results_etag``).
+
+Votes are applied to the cache only once their transaction has committed, so a vote
+that is rolled back never shows up.  Each applied vote also bumps a per-poll version;
+a load that sees the version change while it reads the database and writes the cache
+cannot tell whether that vote is in the counts it read, so it drops what it wrote and
+the next read loads the poll again.  With buffered votes a load also holds off vote
+buffer flushes, which move votes from the buffer to the database.
+
+Structural changes (options added, renamed or deleted) drop the snapshot, and every
+entry expires after ``POLL_RESULTS_CACHE_TIMEOUT`` seconds as a backstop.
+"""
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+from django.utils.http import quote_etag
+
+from core.util import CacheStats, increment_counter
+
+from . import vote_buffer
+from .models import Poll, PollOption
+
+LOGGER = logging.getLogger(__name__)
+
+FRAGMENT_TEMPLATE = "poll/partials/results.html"
+
+_KEY_PREFIX = "poll-results"
+
+stats = CacheStats(_KEY_PREFIX)
+
+
+def _snapshot_key(poll_id):
+    return f"{_KEY_PREFIX}:{poll_id}"
+
+
+def _count_key(poll_id, option_id):
+    return f"{_KEY_PREFIX}:{poll_id}:{option_id}"
+
+
+def _fragment_key(poll_id):
+    return f"{_KEY_PREFIX}:{poll_id}:html"
+
+
+def _version_key(poll_id):
+    return f"{_KEY_PREFIX}:{poll_id}:version"
+
+
+def _load(poll_id):
+    """Builds the cache entries for a poll from the database, returning its results."""
+    version = cache.get(_version_key(poll_id))
+    holding_flushes = vote_buffer.is_buffered() and vote_buffer.hold_flushes()
+    try:
+        poll = Poll.objects.with_results().filter(pk=poll_id).first()
+        if poll is None:
+            return None
+
+        pending = vote_buffer.pending_counts(poll) if vote_buffer.is_buffered() else {}
+        snapshot = {
+            "question": poll.question,
+            "options": [(option.id, option.text) for option in poll.options.all()],
+        }
+        counts = {option.id: option.count + pending.get(option.id, 0) for option in poll.options.all()}
+    finally:
+        if holding_flushes:
+            vote_buffer.release_flushes()
+
+    if vote_buffer.is_buffered() and not holding_flushes:
+        # A flush was moving votes from the buffer to the database while they were read
+        return snapshot, counts
+
+    entries = {_count_key(poll_id, option_id): count for option_id, count in counts.items()}
+    entries[_snapshot_key(poll_id)] = snapshot
+    cache.set_many(entries, timeout=settings.POLL_RESULTS_CACHE_TIMEOUT)
+    if cache.get(_version_key(poll_id)) != version:
+        # A vote was applied during the load and may be missing from, or counted twice in, the counts
+        invalidate(poll_id)
+    return snapshot, counts
+
+
+def get_results(poll_id):
+    """
+    Returns the cached results for a poll, loading them from the database on a miss.
+
+    :param poll_id: The id of the poll.
+    :return: A ``(snapshot, counts)`` tuple, or None if the poll does not exist.
+             ``counts`` maps option id to the number of votes for it.
+    """
+    snapshot = cache.get(_snapshot_key(poll_id))
+    if snapshot is not None:
+        keys = {_count_key(poll_id, option_id): option_id for option_id, _ in snapshot["options"]}
+        values = cache.get_many(keys)
+        if len(values) == len(keys):
+            stats.hit()
+            return snapshot, {keys[key]: value for key, value in values.items()}
+
+    stats.miss()
+    return _load(poll_id)
+
+
+def results_etag(snapshot, counts):
+    """
+    Returns an ETag for a poll's results, which only changes when the question, the
+    options or the counts do, so a refresh with no new votes can be answered with a 304.
+    """
+    signature = (
+        snapshot["question"],
+        snapshot["options"],
+        [counts[option_id] for option_id, _ in snapshot["options"]],
+    )
+    return quote_etag(hashlib.md5(repr(signature).encode(), usedforsecurity=False).hexdigest())
+
+
+def render_results(poll_id, snapshot, counts):
+    """
+    Returns the rendered results fragment for a poll's results, as returned by ``get_results``.
+
+    The fragment is only re-rendered when a vote has changed the counts since it was
+    last rendered; either way no database query is made.
+    """
+    signature = tuple(counts[option_id] for option_id, _ in snapshot["options"])
+    cached_fragment = cache.get(_fragment_key(poll_id))
+    if cached_fragment is not None and cached_fragment[0] == signature:
+        return cached_fragment[1]
+
+    html = render_to_string(
+        FRAGMENT_TEMPLATE,
+        {
+            "poll_id": poll_id,
+            "question": snapshot["question"],
+            "options": [
+                {"id": option_id, "text": text, "count": counts[option_id]}
+                for option_id, text in snapshot["options"]
+            ],
+            "total": sum(signature),
+        },
+    )
+    cache.set(_fragment_key(poll_id), (signature, html), timeout=settings.POLL_RESULTS_CACHE_TIMEOUT)
+    return html
+
+
+def _apply_vote(poll_id, option_id):
+    try:
+        cache.incr(_count_key(poll_id, option_id))
+    except ValueError:
+        # Results are not cached for this poll; the next read loads them from the database
+        pass
+
+    if increment_counter(_version_key(poll_id), timeout=settings.POLL_RESULTS_CACHE_TIMEOUT) is None:
+        # The version could not be bumped - make sure no load keeps stale counts
+        invalidate(poll_id)
+
+
+def record_vote(poll_id, option_id):
+    """Adds a vote that has just been counted to the cached results of a poll, once it is committed."""
+    transaction.on_commit(lambda: _apply_vote(poll_id, option_id))
+
+
+def invalidate(poll_id):
+    cache.delete_many([_snapshot_key(poll_id), _fragment_key(poll_id)])
+
+
+@receiver(post_save, sender=PollOption)
+@receiver(post_delete, sender=PollOption)
+def _poll_option_changed(sender, instance, **kwargs):
+    invalidate(instance.poll_id)
+
+
+@receiver(post_save, sender=Poll)
+def _poll_changed(sender, instance, **kwargs):
+    invalidate(instance.pk)
@@ -1,3 +1,188 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from . import results_cache, vote_buffer
+from .models import Poll, PollOption
+
+
+class RecordVoteConcurrencyTests(TransactionTestCase):
+    def test_concurrent_votes_are_all_counted(self):
+        poll = Poll.objects.create(question="Favourite colour?")
+        red = PollOption.objects.create(poll=poll, text="Red")
+        blue = PollOption.objects.create(poll=poll, text="Blue")
+        threads, votes_per_thread = 8, 25
+
+        def vote(option_id):
+            try:
+                for _ in range(votes_per_thread):
+                    self.assertTrue(Poll.record_vote(poll.id, option_id))
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            # list() re-raises any failure from the worker threads
+            list(executor.map(vote, [red.id, blue.id] * (threads // 2)))
+
+        red.refresh_from_db()
+        blue.refresh_from_db()
+        self.assertEqual(red.count, threads // 2 * votes_per_thread)
+        self.assertEqual(blue.count, threads // 2 * votes_per_thread)
+        self.assertEqual(poll.total(), threads * votes_per_thread)
+
+    def test_vote_for_another_polls_option_is_not_recorded(self):
+        poll = Poll.objects.create(question="Favourite colour?")
+        other = PollOption.objects.create(poll=Poll.objects.create(question="Other?"), text="Red")
+
+        self.assertFalse(Poll.record_vote(poll.id, other.id))
+        other.refresh_from_db()
+        self.assertEqual(other.count, 0)
+
+
+@override_settings(POLL_VOTE_COUNTING=vote_buffer.BUFFERED, POLL_VOTE_BUFFER_FLUSH_THRESHOLD=3)
+class VoteBufferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.poll = Poll.objects.create(question="Favourite colour?")
+        self.option = PollOption.objects.create(poll=self.poll, text="Red")
+        # Start each test inside the flush interval
+        cache.add(vote_buffer._FLUSH_TIMER_KEY, True, timeout=60)
+
+    def test_votes_are_flushed_at_the_threshold(self):
+        vote_buffer.buffer_vote(self.option.id)
+        vote_buffer.buffer_vote(self.option.id)
+        self.option.refresh_from_db()
+        self.assertEqual(self.option.count, 0)
+        self.assertEqual(vote_buffer.pending_counts(self.poll), {self.option.id: 2})
+
+        vote_buffer.buffer_vote(self.option.id)
+        self.option.refresh_from_db()
+        self.assertEqual(self.option.count, 3)
+        self.assertEqual(vote_buffer.pending_counts(self.poll), {})
+
+    def test_flush_votes_writes_pending_votes(self):
+        vote_buffer.buffer_vote(self.option.id)
+        self.assertEqual(vote_buffer.flush_votes(), 1)
+        self.assertEqual(vote_buffer.flush_votes(), 0)
+        self.option.refresh_from_db()
+        self.assertEqual(self.option.count, 1)
+
+    def test_vote_is_written_directly_when_the_cache_loses_it(self):
+        with mock.patch.object(vote_buffer.cache, "incr", side_effect=ValueError):
+            vote_buffer.buffer_vote(self.option.id)
+        self.option.refresh_from_db()
+        self.assertEqual(self.option.count, 1)
+
+    def test_buffering_needs_a_shared_cache(self):
+        with self.settings(CACHE_BACKEND="locmem", CACHE_IS_SHARED=False):
+            with self.assertRaises(ImproperlyConfigured):
+                vote_buffer.check_configuration()
+        with self.settings(CACHE_BACKEND="redis", CACHE_IS_SHARED=True):
+            vote_buffer.check_configuration()
+
+
+class ResultsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.poll = Poll.objects.create(question="Favourite colour?")
+        self.option = PollOption.objects.create(poll=self.poll, text="Red")
+
+    def vote(self):
+        Poll.record_vote(self.poll.id, self.option.id)
+        results_cache.record_vote(self.poll.id, self.option.id)
+
+    def cached_count(self):
+        _, counts = results_cache.get_results(self.poll.id)
+        return counts[self.option.id]
+
+    def test_committed_vote_updates_cached_results(self):
+        self.assertEqual(self.cached_count(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vote()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cached_count(), 1)
+
+    def test_rolled_back_vote_is_not_cached(self):
+        self.assertEqual(self.cached_count(), 0)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.vote()
+                    raise RuntimeError("Rolled back")
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.cached_count(), 0)
+
+    def test_load_that_overlaps_a_vote_is_not_kept(self):
+        with_results = Poll.objects.with_results
+
+        def vote_during_load():
+            # The vote commits after the load has read the database
+            queryset = list(with_results().filter(pk=self.poll.id))
+            with self.captureOnCommitCallbacks(execute=True):
+                self.vote()
+            return Poll.objects.filter(pk__in=[poll.pk for poll in queryset]).with_results()
+
+        with mock.patch.object(Poll.objects, "with_results", side_effect=vote_during_load):
+            _, counts = results_cache.get_results(self.poll.id)
+        self.assertEqual(counts[self.option.id], 1)
+
+        # The counts cached by the overlapping load were dropped, so this read loads them again
+        self.assertIsNone(cache.get(results_cache._snapshot_key(self.poll.id)))
+        self.assertEqual(self.cached_count(), 1)
+
+
+class ResultsViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.poll = Poll.objects.create(question="Favourite colour?")
+        self.option = PollOption.objects.create(poll=self.poll, text="Red", count=3)
+
+    def test_results_page_refreshes_the_fragment(self):
+        response = self.client.get(reverse("results", args=[self.poll.id]))
+        self.assertContains(response, f'hx-get="{reverse("results", args=[self.poll.id])}"')
+        self.assertContains(response, 'hx-trigger="every 2s"')
+
+    def refresh(self, **headers):
+        return self.client.get(reverse("results", args=[self.poll.id]), headers={"HX-Request": "true", **headers})
+
+    def test_refresh_is_served_from_the_cache(self):
+        self.client.get(reverse("results", args=[self.poll.id]))
+        with self.assertNumQueries(0):
+            response = self.refresh()
+        self.assertContains(response, "Red")
+        self.assertNotContains(response, "<html")
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_refresh_without_new_votes_is_not_modified(self):
+        etag = self.refresh()["ETag"]
+
+        with self.assertNumQueries(0), mock.patch.object(cache, "add") as cache_add, \
+                mock.patch.object(cache, "incr") as cache_incr, mock.patch.object(cache, "set") as cache_set:
+            response = self.refresh(If_None_Match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        # Neither the refresh nor counting the hit writes to the cache
+        for cache_write in (cache_add, cache_incr, cache_set):
+            cache_write.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Poll.record_vote(self.poll.id, self.option.id)
+            results_cache.record_vote(self.poll.id, self.option.id)
+        response = self.refresh(If_None_Match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertContains(response, "<strong>4</strong>")
+
+    def test_hits_and_misses_are_counted_per_process(self):
+        stats = results_cache.stats.as_dict()
+        self.refresh()
+        self.refresh()
+        self.assertEqual(results_cache.stats.as_dict()["misses"], stats["misses"] + 1)
+        self.assertEqual(results_cache.stats.as_dict()["hits"], stats["hits"] + 1)
@@ -7,6 +7,7 @@ from polls import views as polls_views
 urlpatterns = [
     path('', polls_views.list, name='list'),
     path('create/', polls_views.create, name='create'),
-    path('results/<poll_id>/', polls_views.results, name='results'),
-    path('vote/<poll_id>/', polls_views.vote, name='vote'),
+    path('results/<int:poll_id>/', polls_views.results, name='results'),
+    path('results/cache_stats/', polls_views.results_cache_stats, name='results_cache_stats'),
+    path('vote/<int:poll_id>/', polls_views.vote, name='vote'),
 ]
@@ -1,13 +1,18 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
 from .forms import CreatePollForm
-from .models import Poll
-from django.http import HttpResponse
+from .models import Poll, PollOption
+from . import results_cache, vote_buffer
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.safestring import mark_safe
 
 
 
 # Create your views here.
 def list(request):
-    polls = Poll.objects.all()
+    polls = Poll.objects.with_results()
 
     context = {
         'polls' : polls
@@ -29,35 +34,61 @@ def create(request):
     return render(request, "poll/create.html", context)
 
 def results(request, poll_id):
-    poll = Poll.objects.get(pk=poll_id)
+    results = results_cache.get_results(poll_id)
+    if results is None:
+        raise Http404('Poll does not exist')
+
+    if request.htmx:
+        # Refreshes revalidate the fragment, so one with no new votes gets an empty 304
+        etag = results_cache.results_etag(*results)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(results_cache.render_results(poll_id, *results))
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ['HX-Request'])
+        return response
+
+    results_fragment = results_cache.render_results(poll_id, *results)
 
     context = {
-        'poll' : poll
+        'poll_id' : poll_id,
+        'refresh_interval' : settings.POLL_RESULTS_REFRESH_INTERVAL,
+        'results_fragment' : mark_safe(results_fragment)
     }
-    return render(request, 'poll/results.html', context)
+    response = render(request, 'poll/results.html', context)
+    patch_vary_headers(response, ['HX-Request'])
+    return response
 
-def vote(request, poll_id):
-    poll = Poll.objects.get(pk=poll_id)
+@staff_member_required
+def results_cache_stats(request):
+    return JsonResponse(results_cache.stats.as_dict())
 
+def vote(request, poll_id):
     if request.method == 'POST':
-
-        selected_option = request.POST['poll']
-        if selected_option == 'option1':
-            poll.option_one_count += 1
-        elif selected_option == 'option2':
-            poll.option_two_count += 1
-        elif selected_option == 'option3':
-            poll.option_three_count += 1
+        selected_option = request.POST.get('poll')
+        try:
+            option_id = PollOption.parse_id(selected_option)
+        except ValueError:
+            return HttpResponseBadRequest('Invalid form option')
+
+        if vote_buffer.is_buffered():
+            recorded = PollOption.objects.filter(pk=option_id, poll_id=poll_id).exists()
+            if recorded:
+                vote_buffer.buffer_vote(option_id)
         else:
-            return HttpResponse(400, 'Invalid form option')
+            recorded = Poll.record_vote(poll_id, option_id)
+
+        if not recorded:
+            raise Http404('Poll option does not exist')
 
-        poll.save()
+        results_cache.record_vote(poll_id, option_id)
 
-        return redirect('results', poll.id)
+        return redirect('results', poll_id)
 
+    poll = get_object_or_404(Poll.objects.prefetch_related('options'), pk=poll_id)
 
     context = {
         'poll' : poll
     }
     return render(request, 'poll/vote.html', context)
-
@@ -0,0 +1,161 @@
+"""
+Write-behind buffer for poll votes.
+
+When ``settings.POLL_VOTE_COUNTING`` is ``"buffered"`` votes are not written to the
+database one at a time.  Instead each vote increments a per-option delta in the cache
+(``CACHES["default"]``) and the accumulated deltas are flushed to the ``PollOption``
+rows in batches, either when a delta reaches ``POLL_VOTE_BUFFER_FLUSH_THRESHOLD`` or
+when a vote arrives ``POLL_VOTE_BUFFER_FLUSH_INTERVAL`` seconds after the last flush.
+Run ``manage.py flush_poll_votes --every <seconds>`` next to the web workers so votes
+are also flushed when no more votes arrive.
+
+Flushing claims the pending deltas (decrements them in the cache) before applying
+them to the database, and puts them back if the database update fails, so votes that
+arrive while a flush is running are never lost or counted twice.
+
+Deltas that have not been flushed yet only live in the cache, so buffering needs a
+cache that is shared by every process and increments atomically (``settings.CACHE_IS_SHARED``,
+i.e. Redis): then a worker crash or restart loses no votes, and ``flush_poll_votes``
+sees the same buffer as the workers.  ``PollsConfig`` refuses to start in buffered
+mode with any other cache.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Case, F, Value, When
+
+from core.util import increment_counter
+
+from .models import PollOption
+
+LOGGER = logging.getLogger(__name__)
+
+IMMEDIATE = "immediate"
+BUFFERED = "buffered"
+
+_BUFFER_KEY_PREFIX = "poll-vote-buffer"
+_FLUSH_TIMER_KEY = f"{_BUFFER_KEY_PREFIX}:flush-timer"
+_FLUSH_LOCK_KEY = f"{_BUFFER_KEY_PREFIX}:flush-lock"
+_FLUSH_LOCK_TIMEOUT = 30
+
+
+def is_buffered():
+    return settings.POLL_VOTE_COUNTING == BUFFERED
+
+
+def check_configuration():
+    """
+    Refuses to buffer votes in a cache that is not shared by every process.
+
+    :raises ImproperlyConfigured: If votes are buffered and the cache is per process or increments non-atomically.
+    """
+    if is_buffered() and not settings.CACHE_IS_SHARED:
+        raise ImproperlyConfigured(
+            f'POLL_VOTE_COUNTING is "{BUFFERED}" but the "{settings.CACHE_BACKEND}" cache is not shared by every '
+            f'process - buffered votes would be lost with the worker that holds them. Use a Redis cache '
+            f'or POLL_VOTE_COUNTING = "{IMMEDIATE}".'
+        )
+
+
+def _buffer_key(option_id):
+    return f"{_BUFFER_KEY_PREFIX}:{option_id}"
+
+
+def buffer_vote(option_id):
+    """
+    Adds one vote for an option to the buffer, flushing if needed.
+
+    If the cache keeps losing the option's delta the vote is written to the database
+    directly instead.
+
+    :param option_id: The id of the selected PollOption.
+    """
+    key = _buffer_key(option_id)
+    pending = increment_counter(key)
+    if pending is None:
+        LOGGER.warning(f"Unable to buffer a vote for poll option {option_id} - writing it to the database")
+        PollOption.objects.filter(pk=option_id).update(count=F("count") + 1)
+        return
+
+    if pending >= settings.POLL_VOTE_BUFFER_FLUSH_THRESHOLD:
+        flush_votes([option_id])
+    elif cache.add(_FLUSH_TIMER_KEY, True, timeout=settings.POLL_VOTE_BUFFER_FLUSH_INTERVAL):
+        # The timer key expired, so the flush interval has elapsed
+        flush_votes()
+
+
+def hold_flushes():
+    """
+    Keeps flush_votes from running until release_flushes is called.
+
+    :return: False if a flush is already running.
+    """
+    return cache.add(_FLUSH_LOCK_KEY, True, timeout=_FLUSH_LOCK_TIMEOUT)
+
+
+def release_flushes():
+    cache.delete(_FLUSH_LOCK_KEY)
+
+
+def pending_counts(poll):
+    """
+    Returns the votes buffered for a poll that have not been flushed yet.
+
+    :param poll: The poll, ideally with its options prefetched.
+    :return: A dict mapping option id to the number of pending votes.
+    """
+    keys = {_buffer_key(option.id): option.id for option in poll.options.all()}
+    return {keys[key]: value for key, value in cache.get_many(keys).items() if value}
+
+
+def flush_votes(option_ids=None):
+    """
+    Writes the buffered votes to the database.
+
+    All options are updated with a single UPDATE statement.  If another flush is
+    already running this call returns without doing anything.
+
+    :param option_ids: The ids of the options to flush. Flushes every option when omitted.
+    :return: The number of votes written to the database.
+    """
+    if not hold_flushes():
+        LOGGER.debug("Vote buffer flush (or results load) already in progress - skipping . . .")
+        return 0
+
+    try:
+        if option_ids is None:
+            option_ids = PollOption.objects.values_list("id", flat=True)
+
+        keys = {_buffer_key(option_id): option_id for option_id in option_ids}
+
+        # Claim the pending deltas; votes that arrive from here on stay in the buffer
+        claimed = {}
+        for key, value in cache.get_many(keys).items():
+            if value:
+                cache.decr(key, value)
+                claimed[key] = value
+
+        if not claimed:
+            return 0
+
+        deltas = {keys[key]: value for key, value in claimed.items()}
+        try:
+            PollOption.objects.filter(pk__in=deltas).update(
+                count=F("count") + Case(
+                    *[When(pk=option_id, then=Value(delta)) for option_id, delta in deltas.items()],
+                    default=Value(0),
+                )
+            )
+        except Exception:
+            LOGGER.exception("Unable to flush buffered votes - returning them to the buffer")
+            for key, value in claimed.items():
+                cache.incr(key, value)
+            raise
+
+        flushed = sum(deltas.values())
+        LOGGER.info(f"Flushed {flushed} buffered votes for {len(deltas)} poll options")
+        return flushed
+    finally:
+        release_flushes()
@@ -0,0 +1,64 @@
+;(function () {
+  const form = document.getElementById("direct-upload-form")
+  if (!form) {
+    return
+  }
+
+  const csrfToken = form.querySelector("[name=csrfmiddlewaretoken]").value
+
+  function postToApp(url, data) {
+    const body = new FormData()
+    for (const [name, value] of Object.entries(data)) {
+      for (const item of [].concat(value)) {
+        body.append(name, item)
+      }
+    }
+    return fetch(url, { method: "POST", body: body, headers: { "X-CSRFToken": csrfToken } }).then((response) =>
+      response.json().then((json) => {
+        if (!response.ok) {
+          throw new Error(json.error)
+        }
+        return json
+      })
+    )
+  }
+
+  // Sends one file straight to the bucket, then tells the app it has arrived
+  function uploadFile(file, presigned, description) {
+    const body = new FormData()
+    for (const [name, value] of Object.entries(presigned.fields)) {
+      body.append(name, value)
+    }
+    body.append("file", file)
+    return fetch(presigned.url, { method: "POST", body: body }).then((response) => {
+      if (!response.ok) {
+        throw new Error(`Upload of ${file.name} failed`)
+      }
+      return postToApp(form.dataset.completeUrl, { token: presigned.token, description: description })
+    })
+  }
+
+  form.addEventListener("submit", (e) => {
+    e.preventDefault()
+    const files = Array.from(form.querySelector("[name=files]").files)
+    const description = form.querySelector("[name=description]").value
+    // The files are presigned together, so the app can check how many are uploaded at once
+    postToApp(form.dataset.presignUrl, {
+      file_name: files.map((file) => file.name),
+      content_type: files.map((file) => file.type),
+      size: files.map((file) => file.size),
+    })
+      .then((presigned) =>
+        Promise.all(files.map((file, i) => uploadFile(file, presigned.uploads[i], description)))
+      )
+      .then(() => {
+        if (form.dataset.modal) {
+          htmx.trigger(document.body, "fileListChanged")
+          bootstrap.Modal.getInstance(document.getElementById("modal")).hide()
+        } else {
+          window.location = form.dataset.doneUrl
+        }
+      })
+      .catch((error) => alert(error.message))
+  })
+})()
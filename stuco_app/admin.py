@@ -1 +1,12 @@
-# Register your models here.
+from django.contrib import admin
+from .models import OutboundEmail
+
+
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ("subject", "recipients", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("subject",)
+    readonly_fields = ("created_at", "sent_at", "last_error")
+
+
+admin.site.register(OutboundEmail, OutboundEmailAdmin)
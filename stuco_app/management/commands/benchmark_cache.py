@@ -0,0 +1,35 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from core.cache_backends import TwoLevelCache
+from core.cache_local import LocalRedisCache
+
+
+class Command(BaseCommand):
+    help = (
+        "Reads a hot key set from a local Redis stand-in with a simulated round trip, alone and "
+        "through the two-level cache, and reports the time per get and the two-level cache stats"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--gets", type=int, default=2000, help="Gets per backend")
+        parser.add_argument("--keys", type=int, default=100, help="Distinct keys read")
+        parser.add_argument("--latency", type=float, default=0.0005, help="Seconds each Redis command takes")
+
+    def handle(self, *args, **options):
+        iterations, keys = options["gets"], options["keys"]
+        shared = LocalRedisCache("benchmark-cache", {"OPTIONS": {"latency": options["latency"]}})
+        two_level = TwoLevelCache("benchmark-cache", {"OPTIONS": {"MAX_ENTRIES": keys}})
+        # The stand-in is not in CACHES, so give the two-level cache the instance directly
+        two_level._shared = shared
+        shared.set_many({f"key-{i}": {"value": i} for i in range(keys)})
+
+        for name, backend in (("shared only", shared), ("two-level", two_level)):
+            counter = iter(range(iterations))
+            seconds = timeit.timeit(lambda: backend.get(f"key-{next(counter) % keys}"), number=iterations)
+            self.stdout.write(f"{name:>11}: {seconds / iterations * 1_000_000:8.1f} us per get ({iterations} gets)")
+        self.stdout.write(f"two-level stats: {two_level.stats()}")
+        two_level.clear()
+
+        self.stdout.write(self.style.SUCCESS(f"Read {keys} keys {iterations} times per backend"))
@@ -0,0 +1,54 @@
+from email.mime.application import MIMEApplication
+import os
+import timeit
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+
+from core.services.email_service import LOGO_ATTACHMENT, build_email_message
+
+
+TEMPLATE_NAME = "email_templates/app_registration_template.html"
+CONTEXT = {"confirmation_code": "123456", "webapp_base_url": "http://localhost:8000", "first_name": "Benchmark"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds registration emails with the logo read from disk for every message and with "
+        "the preloaded logo part, and reports the time per message and per template lookup"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=2000, help="Messages to build per variant")
+
+    def handle(self, *args, **options):
+        iterations = options["messages"]
+
+        def build_reading_logo():
+            html = get_template(TEMPLATE_NAME).render(CONTEXT)
+            email_message = EmailMultiAlternatives("Subject", "Text", to=["student@example.com"])
+            email_message.attach_alternative(html, "text/html")
+            with open(settings.BASE_DIR / LOGO_ATTACHMENT, "rb") as logo_file:
+                att = MIMEApplication(logo_file.read())
+            att.add_header("Content-ID", "<stuco-logo>")
+            att.add_header("Content-Disposition", "attachment", filename=os.path.basename(LOGO_ATTACHMENT))
+            email_message.attach(att)
+            return email_message
+
+        def build_with_preloaded_logo():
+            html = get_template(TEMPLATE_NAME).render(CONTEXT)
+            return build_email_message(["student@example.com"], "Subject", "Text", html)
+
+        for name, build in (
+            ("logo read per message", build_reading_logo),
+            ("preloaded logo", build_with_preloaded_logo),
+            # The cached template loader compiles the template once, so a lookup is all get_template costs
+            ("get_template only", lambda: get_template(TEMPLATE_NAME)),
+        ):
+            build()
+            seconds = timeit.timeit(build, number=iterations)
+            self.stdout.write(f"{name:>22}: {seconds / iterations * 1_000_000:8.1f} us ({iterations} calls)")
+
+        self.stdout.write(self.style.SUCCESS(f"Built {iterations} messages per variant"))
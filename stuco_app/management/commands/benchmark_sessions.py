@@ -0,0 +1,73 @@
+from importlib import import_module
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from stuco_app.views import home
+from users.models import CustomUser
+
+
+ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "hybrid": "core.sessions",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Serves the home view through the session, auth and message middleware with each session "
+        "engine, for an anonymous and a logged-in user, and reports the time and queries per request"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Requests per engine and user")
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+
+        def serve(handler, session_cookie):
+            request = factory.get("/")
+            if session_cookie:
+                request.COOKIES[settings.SESSION_COOKIE_NAME] = session_cookie
+            return handler(request)
+
+        # Everything the benchmark writes, including its user and sessions, is rolled back
+        with transaction.atomic():
+            user = CustomUser.objects.create_user(
+                f"benchmark-{uuid.uuid4().hex}@example.com", first_name="Benchmark", last_name="User"
+            )
+            for name, engine in ENGINES.items():
+                with override_settings(SESSION_ENGINE=engine):
+                    handler = SessionMiddleware(AuthenticationMiddleware(MessageMiddleware(home)))
+                    session = import_module(engine).SessionStore()
+                    session[SESSION_KEY] = str(user.pk)
+                    session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+                    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+                    session.save()
+
+                    for visitor, session_cookie in (("anonymous", None), ("logged in", session.session_key)):
+                        # Warm up, so cached engines are measured with the session cached
+                        serve(handler, session_cookie)
+                        with CaptureQueriesContext(connection) as queries:
+                            start = time.perf_counter()
+                            for _ in range(options["requests"]):
+                                serve(handler, session_cookie)
+                            elapsed = time.perf_counter() - start
+                        self.stdout.write(
+                            f"{name:>9} {visitor:>9}: {elapsed / options['requests'] * 1000:6.2f} ms, "
+                            f"{len(queries) / options['requests']:.1f} queries per request"
+                        )
+                    session.delete()
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(f"Served {options['requests']} requests per engine and user"))
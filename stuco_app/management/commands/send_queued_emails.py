@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.services import email_outbox
+
+
+class Command(BaseCommand):
+    help = "Sends the emails queued in the outbox, retrying failed ones with backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Send the emails that are due and exit instead of waiting for more",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Sending queued emails . . .")
+        try:
+            email_outbox.run(once=options["once"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS("Stopped sending queued emails"))
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.14 on 2026-10-17 16:10
+
+from django.db import migrations
+
+
+def clear_delivered_email_content(apps, schema_editor):
+    # Sent and failed emails no longer need their bodies, which hold verification codes
+    OutboundEmail = apps.get_model('stuco_app', 'OutboundEmail')
+    db_alias = schema_editor.connection.alias
+
+    OutboundEmail.objects.using(db_alias).filter(status__in=['sent', 'failed']).update(
+        text_content='', html_content=''
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stuco_app', '0001_outboundemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_delivered_email_content, migrations.RunPython.noop),
+    ]
@@ -1 +1,40 @@
-# Create your models here.
+from django.db import models
+from django.utils import timezone
+
+
+class OutboundEmail(models.Model):
+    """An email waiting in (or sent from) the outbox, see core.services.email_outbox."""
+
+    QUEUED = "queued"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    ]
+
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField(help_text="List of destination email addresses")
+    reply_to = models.JSONField(blank=True, null=True, help_text="List of reply-to email addresses")
+    subject = models.CharField(max_length=998)
+    text_content = models.TextField()
+    html_content = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now, help_text="When the worker may (re)try sending")
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'outbound_email'
+        db_table_comment = "Outbox of emails sent in the background by manage.py send_queued_emails"
+        ordering = ["next_attempt_at", "id"]
+        indexes = [
+            # Supports the worker's query for queued emails that are due
+            models.Index(fields=["status", "next_attempt_at"], name="outbound_email_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)}"
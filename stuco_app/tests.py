@@ -1 +1,197 @@
-# Create your tests here.
+import time
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.cache_backends import TwoLevelCache
+from core.cache_local import LocalRedisCache
+from core.services import email_outbox, email_service
+from stuco_app.models import OutboundEmail
+
+
+@override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_SEND_RATE=0)
+class EmailOutboxTests(TestCase):
+    def queue_email(self):
+        return email_outbox.enqueue(
+            ["student@example.com"],
+            "Your verification code",
+            "Your code is 123456",
+            "<p>Your code is 123456</p>",
+            "noreply@example.com",
+        )
+
+    def test_sent_email_content_is_cleared(self):
+        email = self.queue_email()
+
+        self.assertEqual(email_outbox.send_due(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("123456", mail.outbox[0].body)
+        self.assertEqual(mail.outbox[0].from_email, "noreply@example.com")
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.SENT)
+        self.assertEqual((email.text_content, email.html_content), ("", ""))
+        self.assertEqual(email.recipients, ["student@example.com"])
+
+    def test_content_is_kept_for_retries_and_cleared_when_given_up_on(self):
+        email = self.queue_email()
+
+        with mock.patch.object(email_outbox, "send_messages", return_value=[Exception("Throttled")]):
+            self.assertEqual(email_outbox.send_due(), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual(email.status, OutboundEmail.QUEUED)
+            self.assertEqual(email.text_content, "Your code is 123456")
+
+            OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=email.created_at)
+            self.assertEqual(email_outbox.send_due(), (0, 1))
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.FAILED)
+        self.assertEqual(email.last_error, "Throttled")
+        self.assertEqual((email.text_content, email.html_content), ("", ""))
+
+
+
+@override_settings(EMAIL_DELIVERY="immediate", EMAIL_BULK_BATCH_SIZE=2, EMAIL_SEND_RATE=0)
+class SendBulkEmailTests(TestCase):
+    template_name = "email_templates/app_registration_template.html"
+
+    def recipients(self, count):
+        return [
+            {"email": f"student{i}@example.com", "first_name": f"Student {i}", "confirmation_code": f"{i:06}"}
+            for i in range(count)
+        ]
+
+    def send(self, recipients):
+        return email_service.MailSender().send_bulk_email(
+            self.template_name, "Welcome", recipients, from_email="council@example.com"
+        )
+
+    def test_each_recipient_gets_their_own_email(self):
+        results = self.send(self.recipients(3))
+
+        self.assertEqual(results, [
+            email_service.BulkSendResult(f"student{i}@example.com", "sent", None) for i in range(3)
+        ])
+        self.assertEqual([message.to for message in mail.outbox], [[f"student{i}@example.com"] for i in range(3)])
+        self.assertEqual({message.from_email for message in mail.outbox}, {"council@example.com"})
+        self.assertIn("000002", mail.outbox[2].alternatives[0][0])
+
+    def test_emails_are_sent_in_batches(self):
+        def send_all(messages, limiter):
+            return [None] * len(messages)
+
+        with mock.patch.object(email_service, "send_messages", side_effect=send_all) as send:
+            self.send(self.recipients(5))
+
+        self.assertEqual([len(call.args[0]) for call in send.call_args_list], [2, 2, 1])
+
+    def test_failed_recipient_does_not_stop_the_others(self):
+        backend_send = EmailBackend.send_messages
+
+        def reject_student1(connection, messages):
+            if messages[0].to == ["student1@example.com"]:
+                raise ValueError("Address rejected")
+            return backend_send(connection, messages)
+
+        with mock.patch.object(EmailBackend, "send_messages", reject_student1), \
+                self.assertLogs("core.services.email_service", "WARNING"):
+            results = self.send(self.recipients(3))
+
+        self.assertEqual([result.status for result in results], ["sent", "failed", "sent"])
+        self.assertEqual(results[1].error, "Address rejected")
+        self.assertEqual([message.to for message in mail.outbox], [["student0@example.com"], ["student2@example.com"]])
+
+    @override_settings(EMAIL_DELIVERY="outbox")
+    def test_emails_are_queued_in_the_outbox(self):
+        results = self.send(self.recipients(3))
+
+        self.assertEqual({result.status for result in results}, {"queued"})
+        self.assertEqual(mail.outbox, [])
+        queued = OutboundEmail.objects.order_by("id")
+        self.assertEqual([email.recipients for email in queued], [[f"student{i}@example.com"] for i in range(3)])
+        self.assertEqual({email.from_email for email in queued}, {"council@example.com"})
+
+
+class LocalRedisCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = LocalRedisCache("tests", {})
+        self.cache.clear()
+
+    def test_add_only_sets_a_missing_key(self):
+        self.assertTrue(self.cache.add("key", {"value": 1}))
+        self.assertFalse(self.cache.add("key", {"value": 2}))
+        self.assertEqual(self.cache.get("key"), {"value": 1})
+
+    def test_incr_counts_from_an_added_zero(self):
+        self.cache.add("counter", 0)
+        self.assertEqual(self.cache.incr("counter"), 1)
+        self.assertEqual(self.cache.incr("counter", 5), 6)
+        self.assertEqual(self.cache.get("counter"), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr("missing")
+
+    def test_entries_expire(self):
+        self.cache.set("key", "value", timeout=60)
+        with mock.patch("core.cache_local.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertIsNone(self.cache.get("key"))
+        self.cache.set("key", "value", timeout=0)
+        self.assertFalse(self.cache.has_key("key"))
+
+    def test_get_many_skips_missing_keys(self):
+        self.cache.set_many({"a": 1, "b": "two"})
+        self.assertEqual(self.cache.get_many(["a", "b", "c"]), {"a": 1, "b": "two"})
+
+
+class TwoLevelCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.shared = LocalRedisCache("two-level-tests", {})
+        self.cache = self.two_level_cache()
+        self.cache.clear()
+
+    def two_level_cache(self):
+        """Returns a two-level cache in front of the stand-in, as another worker would see it."""
+        # The local level and its stats are kept per name, so each test gets its own
+        two_level = TwoLevelCache(self.id(), {"OPTIONS": {"LOCAL_TIMEOUT": 60}})
+        two_level._shared = self.shared
+        return two_level
+
+    def test_counter_incremented_elsewhere_is_read_fresh(self):
+        self.cache.add("counter", 0)
+        self.assertEqual(self.cache.get("counter"), 0)
+        self.assertEqual(self.cache.get_many(["counter"]), {"counter": 0})
+
+        # Another worker increments the shared counter
+        self.shared.incr("counter", 2, version=1)
+        self.assertEqual(self.cache.get("counter"), 2)
+        self.assertEqual(self.cache.get_many(["counter"]), {"counter": 2})
+        self.assertEqual(self.cache.incr("counter"), 3)
+        self.assertEqual(self.cache.get("counter"), 3)
+
+    def test_values_are_served_locally_until_the_local_timeout(self):
+        self.cache.set("fragment", "<p>Red</p>")
+        self.shared.set("fragment", "<p>Blue</p>", version=1)
+        self.assertEqual(self.cache.get("fragment"), "<p>Red</p>")
+        self.assertEqual(self.cache.get_many(["fragment"]), {"fragment": "<p>Red</p>"})
+
+        with mock.patch("core.cache_backends.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertEqual(self.cache.get("fragment"), "<p>Blue</p>")
+
+    def test_stats(self):
+        self.cache.set("key", "value")
+        self.cache.get("key")
+        self.cache.get("missing")
+        self.assertEqual(
+            self.cache.stats(),
+            {
+                "local_hits": 1,
+                "shared_hits": 0,
+                "misses": 1,
+                "evictions": 0,
+                "local_entries": 1,
+                "local_hit_rate": 0.5,
+                "hit_rate": 0.5,
+            },
+        )
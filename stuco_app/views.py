@@ -1,7 +1,11 @@
 # Create your views here.
 # Create your views here.
-from django.shortcuts import render, redirect
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.shortcuts import render, redirect
 
 
 def about(request):
@@ -21,3 +25,10 @@ def home(request):
 def django_login(request):
     # return redirect("/admin/login/?next=/")
     return redirect("/accounts/login/?next=/")
+
+
+@staff_member_required
+def cache_stats(request):
+    # Only the two-level cache keeps statistics, and they cover this worker process only
+    stats = cache.stats() if hasattr(cache, "stats") else {}
+    return JsonResponse({"backend": settings.CACHE_BACKEND, **stats})
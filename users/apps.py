@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "users"
+
+    def ready(self):
+        # Replace the per-login last_login save with the batched recorder when buffering
+        from . import login_activity
+
+        login_activity.connect()
@@ -4,12 +4,13 @@ from django.contrib.auth.forms import (
     AuthenticationForm,
     UsernameField,
 )
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
 from django.forms.widgets import EmailInput
 from django import forms
-from users.models import CustomUser
+from users.models import CustomUser, VerificationCode
 import re
 
 import logging
@@ -106,9 +107,12 @@ class CustomUserRegisterForm(CustomUserCreationForm):
 
 
 class ConfirmEmailForm(forms.Form):
+    # The user the form was filled in for, set by clean()
+    user = None
+
     confirmation_code = forms.CharField(
         label="Confirmation Code",
-        max_length=7,
+        max_length=settings.CONFIRMATION_CODE_LENGTH,
         help_text="Enter the confirmation code sent to your email address",
     )
     email = forms.EmailField(
@@ -127,14 +131,18 @@ class ConfirmEmailForm(forms.Form):
         confirmation_code = cleaned_data.get("confirmation_code")
         if not confirmation_code:
             self.add_error("confirmation_code", "Confirmation Code is required.")
-        else:
-            target_user = CustomUser.objects.filter(email=email).first()
-            if not target_user or (confirmation_code != target_user.confirmation_code):
+        elif email:
+            # The view uses the user found here, so confirming takes a single lookup
+            self.user = VerificationCode.find_user(email, VerificationCode.CONFIRM_EMAIL, confirmation_code)
+            if not self.user:
                 self.add_error("email", "Email Address and Confirmation Code do not match.")
         return cleaned_data
 
 
 class ForgotPasswordForm(forms.Form):
+    # The user the form was filled in for, set by clean()
+    user = None
+
     email = forms.EmailField(
         label="Email",
         help_text="Enter the email address that you used to register",
@@ -147,16 +155,19 @@ class ForgotPasswordForm(forms.Form):
             cleaned_data["email"] = email.lower()
         else:
             self.add_error("email", "Valid Email is required.")
-        target_user = CustomUser.objects.filter(email=email).first()
-        if not target_user:
+        self.user = CustomUser.objects.filter(email=email).first() if email else None
+        if not self.user:
             self.add_error("email", "Sorry, we do not recognize that email address.  Want to try another?")
         return cleaned_data
 
 
 class ResetPasswordForm(forms.Form):
+    # The user the form was filled in for, set by clean()
+    user = None
+
     confirmation_code = forms.CharField(
         label="Confirmation Code",
-        max_length=7,
+        max_length=settings.CONFIRMATION_CODE_LENGTH,
         help_text="Enter the confirmation code sent to your email address",
     )
     email = forms.EmailField(
@@ -181,8 +192,10 @@ class ResetPasswordForm(forms.Form):
             cleaned_data["email"] = email.lower()
         else:
             self.add_error("email", "Valid Email is required.")
-        target_user = CustomUser.objects.filter(email=email).first()
-        if not target_user or (cleaned_data.get("confirmation_code") != target_user.confirmation_code):
+        confirmation_code = cleaned_data.get("confirmation_code")
+        if email and confirmation_code:
+            self.user = VerificationCode.find_user(email, VerificationCode.RESET_PASSWORD, confirmation_code)
+        if not self.user:
             self.add_error(
                 "email",
                 "Invalid email address and confirmation code combination.  Please consult the email that "
@@ -191,7 +204,7 @@ class ResetPasswordForm(forms.Form):
         password = cleaned_data.get("password1")
         LOGGER.warning(f"Validation Password: {password}")
         try:
-            validate_password(password, target_user)
+            validate_password(password, self.user)
         except ValidationError as e:
             for next_error in e.error_list:
                 self.add_error("password1", next_error)
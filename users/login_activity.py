@@ -0,0 +1,123 @@
+"""
+Deferred, batched recording of users' last login times.
+
+Django's ``update_last_login`` saves the user row on every login.  When
+``settings.LAST_LOGIN_RECORDING`` is ``"buffered"`` it is replaced by ``record_login``,
+which only notes the login time in an in-process buffer, coalescing repeated logins of
+the same user.  The buffer is written to the database with a single UPDATE when it holds
+``LAST_LOGIN_BUFFER_FLUSH_THRESHOLD`` users, when a login arrives more than
+``LAST_LOGIN_BUFFER_FLUSH_INTERVAL`` seconds after the last flush, and when the process
+exits, so login throughput is not bound by a row write per login.
+
+``last_login`` is informational, so up to one flush interval of login times may be lost
+if a worker is killed outright, and the value shown in the admin may lag behind by as
+much.  The ``django_login_history2`` login record is still written on every login.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.utils import timezone
+
+LOGGER = logging.getLogger(__name__)
+
+IMMEDIATE = "immediate"
+BUFFERED = "buffered"
+
+# The dispatch_uid django.contrib.auth connects update_last_login with
+_UPDATE_LAST_LOGIN_UID = "update_last_login"
+
+_pending = {}
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def is_buffered():
+    return settings.LAST_LOGIN_RECORDING == BUFFERED
+
+
+def record_login(sender, user, **kwargs):
+    """
+    Receives user_logged_in and buffers the user's login time, flushing if needed.
+
+    :param user: The user who logged in.
+    """
+    global _last_flush
+
+    user.last_login = timezone.now()
+    with _pending_lock:
+        _pending[user.pk] = user.last_login
+        flush_due = (
+            len(_pending) >= settings.LAST_LOGIN_BUFFER_FLUSH_THRESHOLD
+            or time.monotonic() - _last_flush >= settings.LAST_LOGIN_BUFFER_FLUSH_INTERVAL
+        )
+        if flush_due:
+            _last_flush = time.monotonic()
+
+    if flush_due:
+        flush_logins()
+
+
+def pending_count():
+    """Returns the number of users whose last login time has not been written yet."""
+    return len(_pending)
+
+
+def flush_logins():
+    """
+    Writes the buffered last login times of this process to the database.
+
+    Every user is updated with a single UPDATE statement.
+
+    :return: The number of users updated.
+    """
+    with _pending_lock:
+        if not _pending:
+            return 0
+        claimed = _pending.copy()
+        _pending.clear()
+
+    try:
+        get_user_model().objects.filter(pk__in=claimed).update(
+            last_login=Case(
+                *[When(pk=user_id, then=Value(login_at)) for user_id, login_at in claimed.items()],
+                default=F("last_login"),
+                output_field=DateTimeField(),
+            )
+        )
+    except Exception:
+        LOGGER.exception("Unable to flush buffered last login times - returning them to the buffer")
+        with _pending_lock:
+            # Logins recorded since the claim are newer, so they take precedence
+            for user_id, login_at in claimed.items():
+                _pending.setdefault(user_id, login_at)
+        raise
+
+    LOGGER.info(f"Flushed the last login times of {len(claimed)} users")
+    return len(claimed)
+
+
+def _flush_at_exit():
+    try:
+        flush_logins()
+    except Exception:
+        # Already logged by flush_logins, and there is nothing left to retry with
+        pass
+
+
+def connect():
+    """
+    Replaces Django's update_last_login receiver with record_login when buffering.
+
+    Connecting under Django's dispatch_uid means the receiver auth connects later is ignored.
+    """
+    if not is_buffered():
+        return
+    user_logged_in.disconnect(dispatch_uid=_UPDATE_LAST_LOGIN_UID)
+    user_logged_in.connect(record_login, dispatch_uid=_UPDATE_LAST_LOGIN_UID)
+    atexit.register(_flush_at_exit)
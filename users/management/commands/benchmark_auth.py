@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+import statistics
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.cognito_idp_service import cognito_client, user_cache_metrics
+
+
+STEPS = ("sign_up_user", "admin_get_user", "admin_confirm_sign_up", "authenticate_user", "reset_password")
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the Cognito calls of the sign up, confirm email, login and password reset flows "
+        "against the local Cognito stand-in and reports the latency of each step"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100, help="Number of users to run the flows for")
+        parser.add_argument("--threads", type=int, default=10, help="Number of users to run at the same time")
+        parser.add_argument("--lookups", type=int, default=3, help="admin_get_user calls per user")
+
+    def handle(self, *args, **options):
+        if settings.COGNITO_BACKEND != "local":
+            raise CommandError('Set COGNITO_BACKEND to "local" - this command must not run against AWS')
+
+        timings = {step: [] for step in STEPS}
+
+        def timed(step, call, *call_args):
+            start = time.perf_counter()
+            call(*call_args)
+            timings[step].append(time.perf_counter() - start)
+
+        def run_flows(_):
+            client = cognito_client()
+            email = f"benchmark-{uuid.uuid4().hex}@example.com"
+            timed("sign_up_user", client.sign_up_user, email, "Password-1234")
+            for _ in range(options["lookups"]):
+                timed("admin_get_user", client.admin_get_user, email)
+            timed("admin_confirm_sign_up", client.admin_confirm_sign_up, email)
+            timed("authenticate_user", client.authenticate_user, email, "Password-1234")
+            timed("reset_password", client.reset_password, email, None, "Password-5678")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+            list(executor.map(run_flows, range(options["users"])))
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(f"Injected latency: {settings.COGNITO_LOCAL_LATENCY * 1000:.0f} ms per call")
+        for step, durations in timings.items():
+            durations.sort()
+            self.stdout.write(
+                f"{step:>22}: mean {statistics.mean(durations) * 1000:7.1f} ms, "
+                f"p95 {durations[int(len(durations) * 0.95) - 1] * 1000:7.1f} ms ({len(durations)} calls)"
+            )
+        self.stdout.write(f"admin_get_user cache: {user_cache_metrics()}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Ran the flows for {options['users']} users in {elapsed:.2f} s "
+            f"({options['users'] / elapsed:.1f} users/s)"
+        ))
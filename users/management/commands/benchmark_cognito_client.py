@@ -0,0 +1,72 @@
+import http.server
+import json
+import os
+import threading
+import timeit
+from unittest import mock
+
+import boto3
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from core.services import cognito_idp_service
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    """Answers every Cognito call with an empty admin_get_user response."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({"Username": "student", "UserAttributes": []}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-amz-json-1.1")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Times admin_get_user calls against a local HTTP stub of the Cognito endpoint, creating "
+        "a boto3 client for every call and with the shared client, and reports the time per call"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=300, help="admin_get_user calls per variant")
+
+    def handle(self, *args, **options):
+        iterations = options["calls"]
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        endpoint_url = f"http://127.0.0.1:{server.server_port}"
+        # The stub does not check signatures, but boto3 needs credentials to sign with
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "stub")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "stub")
+
+        def client_per_call():
+            boto3.client(
+                "cognito-idp", region_name=settings.AWS_DEFAULT_REGION, endpoint_url=endpoint_url
+            ).admin_get_user(UserPoolId="pool", Username="student")
+
+        def shared_client():
+            cognito_idp_service._cognito_idp_client().admin_get_user(UserPoolId="pool", Username="student")
+
+        try:
+            # A fresh shared client, pointed at the stub
+            with override_settings(COGNITO_BACKEND="aws", COGNITO_ENDPOINT_URL=endpoint_url), \
+                    mock.patch.object(cognito_idp_service, "_idp_client", None):
+                for name, call in (("client per call", client_per_call), ("shared client", shared_client)):
+                    call()
+                    seconds = timeit.timeit(call, number=iterations)
+                    self.stdout.write(f"{name:>15}: {seconds / iterations * 1000:6.2f} ms per admin_get_user")
+        finally:
+            server.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(f"Made {iterations} admin_get_user calls per variant"))
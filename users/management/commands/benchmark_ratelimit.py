@@ -0,0 +1,36 @@
+import timeit
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from core.ratelimit import rate_limit
+
+
+def view(request):
+    return HttpResponse()
+
+
+class Command(BaseCommand):
+    help = (
+        "Serves a trivial view with and without the auth rate limit, using the configured cache, "
+        "and reports the time per request"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20000, help="Requests per variant")
+
+    def handle(self, *args, **options):
+        iterations = options["requests"]
+        request = RequestFactory().post("/", {"email": "benchmark@example.com"})
+
+        # A limit that is never reached, so every request takes the full allowed path
+        limited_view = rate_limit("benchmark", rate_per_minute=10 ** 9, burst=10 ** 9)(view)
+        for name, call in (("no limit", lambda: view(request)), ("rate limited", lambda: limited_view(request))):
+            seconds = timeit.timeit(call, number=iterations)
+            self.stdout.write(f"{name:>12}: {seconds / iterations * 1_000_000:7.1f} us per request")
+
+        self.stdout.write(f"Cache backend: {settings.CACHE_BACKEND} ({type(caches['default']).__name__})")
+        self.stdout.write(self.style.SUCCESS(f"Served {iterations} requests per variant"))
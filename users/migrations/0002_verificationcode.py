@@ -0,0 +1,30 @@
+# Generated by Django 5.0.14 on 2026-10-17 15:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerificationCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('purpose', models.CharField(choices=[('confirm_email', 'Confirm email'), ('reset_password', 'Reset password')], max_length=20)),
+                ('code_hash', models.CharField(db_index=True, help_text='HMAC of the email, purpose and code', max_length=64)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='verification_codes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'verification_code',
+                'indexes': [models.Index(fields=['user', 'purpose'], name='verification_code_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-17 15:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_verificationcode'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='last_login',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
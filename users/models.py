@@ -1,8 +1,14 @@
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
 from django.utils.translation import gettext_lazy as _
 from auditlog.registry import auditlog
+from datetime import timedelta
+import secrets
+import string
 import uuid
 
 
@@ -62,7 +68,7 @@ class CustomUser(AbstractUser):
 
     email = models.EmailField(_("email address"), unique=True)
     middle_name = models.CharField(max_length=50, blank=True, null=True)
-    last_login = models.DateTimeField(null=True, blank=True, auto_now=True)
+    last_login = models.DateTimeField(null=True, blank=True)
 
     # Make email field the unique identifier for users
     USERNAME_FIELD = "email"
@@ -84,4 +90,78 @@ class CustomUser(AbstractUser):
         return self.email
 
 
+class VerificationCode(models.Model):
+    """
+    A one-time code emailed to a user to confirm their email address or reset their password.
+
+    Only an HMAC of the code, bound to the user's email address and the code's purpose, is
+    stored.  Since the email is part of the hash, finding the user for an (email, code) pair
+    is a single indexed lookup on ``code_hash``.
+    """
+
+    CONFIRM_EMAIL = "confirm_email"
+    RESET_PASSWORD = "reset_password"
+    PURPOSE_CHOICES = [
+        (CONFIRM_EMAIL, "Confirm email"),
+        (RESET_PASSWORD, "Reset password"),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="verification_codes")
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    code_hash = models.CharField(max_length=64, db_index=True, help_text="HMAC of the email, purpose and code")
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "verification_code"
+        indexes = [
+            models.Index(fields=["user", "purpose"], name="verification_code_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_purpose_display()} code for {self.user_id}"
+
+    @staticmethod
+    def hash_code(email, purpose, code):
+        return salted_hmac(
+            "users.VerificationCode", f"{email.lower()}:{purpose}:{code}", algorithm="sha256"
+        ).hexdigest()
+
+    @classmethod
+    def issue(cls, user, purpose):
+        """
+        Creates a new code for a user, replacing any earlier code for the same purpose.
+
+        :return: The code to send to the user.
+        """
+        code = "".join(secrets.choice(string.digits) for _ in range(settings.CONFIRMATION_CODE_LENGTH))
+        cls.objects.filter(user=user, purpose=purpose).delete()
+        cls.objects.create(
+            user=user,
+            purpose=purpose,
+            code_hash=cls.hash_code(user.email, purpose, code),
+            expires_at=timezone.now() + timedelta(seconds=settings.CONFIRMATION_CODE_EXPIRES),
+        )
+        return code
+
+    @classmethod
+    def find_user(cls, email, purpose, code):
+        """
+        Returns the user an unexpired code was issued to, with a single query.
+
+        :return: The CustomUser, or None if the email and code do not match.
+        """
+        verification_code = (
+            cls.objects.select_related("user")
+            .filter(code_hash=cls.hash_code(email, purpose, code), purpose=purpose, expires_at__gt=timezone.now())
+            .first()
+        )
+        return verification_code.user if verification_code else None
+
+    @classmethod
+    def consume(cls, user, purpose):
+        """Deletes a user's codes for a purpose once one has been used."""
+        cls.objects.filter(user=user, purpose=purpose).delete()
+
+
 auditlog.register(CustomUser)
@@ -1 +1,431 @@
-# Create your tests here.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core import ratelimit, sessions
+from core.services import cognito_idp_service
+from core.services.cognito_local import LocalCognitoIdpClient
+from users import login_activity
+from users.models import CustomUser, VerificationCode
+
+
+class LocalCognitoTestCase(SimpleTestCase):
+    """Runs the Cognito service against a LocalCognitoIdpClient holding one unconfirmed user."""
+
+    email = "student@example.com"
+
+    def setUp(self):
+        cache.clear()
+        self.idp = LocalCognitoIdpClient(latency=0)
+        self.idp.sign_up(ClientId="client", Username=cognito_idp_service._cognito_username_from_email(self.email),
+                         Password="Password-1234")
+        with mock.patch.object(cognito_idp_service, "_cognito_idp_client", return_value=self.idp):
+            self.service = cognito_idp_service.cognito_client()
+        # The service is a singleton, which may already have been created with another client
+        patcher = mock.patch.object(self.service, "cognito_idp_client", self.idp)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def user(self):
+        return self.idp.users[cognito_idp_service._cognito_username_from_email(self.email)]
+
+
+class AdminConfirmSignUpTests(LocalCognitoTestCase):
+    def wait_for_each_other(self, *method_names):
+        """Makes each call wait until all of them have started, which only returns if they run concurrently."""
+        started = threading.Barrier(len(method_names), timeout=5)
+        for method_name in method_names:
+            call = getattr(self.idp, method_name)
+
+            def wait_then_call(*args, call=call, **kwargs):
+                started.wait()
+                return call(*args, **kwargs)
+
+            patcher = mock.patch.object(self.idp, method_name, side_effect=wait_then_call)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_both_calls_run_concurrently(self):
+        self.wait_for_each_other("admin_update_user_attributes", "admin_confirm_sign_up")
+
+        self.assertTrue(self.service.admin_confirm_sign_up(self.email))
+        self.assertEqual(self.user()["status"], "CONFIRMED")
+        self.assertEqual(self.user()["attributes"]["email_verified"], "true")
+
+    def test_error_is_raised_after_the_other_call_finishes(self):
+        error = ClientError({"Error": {"Code": "TooManyRequestsException", "Message": "Rate exceeded"}},
+                            "AdminUpdateUserAttributes")
+        with mock.patch.object(self.idp, "admin_update_user_attributes", side_effect=error):
+            with self.assertRaises(ClientError) as raised:
+                self.service.admin_confirm_sign_up(self.email)
+
+        self.assertIs(raised.exception, error)
+        self.assertEqual(self.user()["status"], "CONFIRMED")
+
+    def test_unknown_user_error_propagates(self):
+        with self.assertRaises(ClientError) as raised:
+            self.service.admin_confirm_sign_up("nobody@example.com")
+        self.assertEqual(raised.exception.response["Error"]["Code"], "UserNotFoundException")
+
+    def test_run_concurrently_returns_results_in_order(self):
+        self.assertEqual(cognito_idp_service._run_concurrently(lambda: 1, lambda: 2, lambda: 3), [1, 2, 3])
+
+
+
+class AdminGetUserCacheTests(LocalCognitoTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(self.idp, "admin_get_user", wraps=self.idp.admin_get_user)
+        self.admin_get_user = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.metrics = cognito_idp_service.user_cache_metrics()
+
+    def metrics_change(self):
+        metrics = cognito_idp_service.user_cache_metrics()
+        return {
+            counter: metrics[counter] - self.metrics[counter]
+            for counter in ("hits", "misses", "negative_hits", "saved_round_trips")
+        }
+
+    def test_user_is_cached(self):
+        first = self.service.admin_get_user(self.email)
+        second = self.service.admin_get_user(self.email)
+
+        self.assertEqual(first, second)
+        self.assertEqual(second["UserStatus"], "UNCONFIRMED")
+        self.assertEqual(self.admin_get_user.call_count, 1)
+        self.assertEqual(
+            self.metrics_change(), {"hits": 1, "misses": 1, "negative_hits": 0, "saved_round_trips": 1}
+        )
+
+    def test_missing_user_is_cached(self):
+        for _ in range(2):
+            with self.assertRaises(cognito_idp_service.UserDoesNotExistException):
+                self.service.admin_get_user("nobody@example.com")
+
+        self.assertEqual(self.admin_get_user.call_count, 1)
+        self.assertEqual(
+            self.metrics_change(), {"hits": 1, "misses": 1, "negative_hits": 1, "saved_round_trips": 1}
+        )
+
+    def test_sign_up_invalidates_a_missing_user(self):
+        with self.assertRaises(cognito_idp_service.UserDoesNotExistException):
+            self.service.admin_get_user("new@example.com")
+
+        self.assertTrue(self.service.sign_up_user("new@example.com", "Password-1234"))
+        self.assertEqual(self.service.admin_get_user("new@example.com")["UserStatus"], "UNCONFIRMED")
+
+    def test_confirming_invalidates_the_user(self):
+        self.service.admin_get_user(self.email)
+
+        self.service.admin_confirm_sign_up(self.email)
+        self.assertEqual(self.service.admin_get_user(self.email)["UserStatus"], "CONFIRMED")
+        self.assertEqual(self.admin_get_user.call_count, 2)
+
+    def test_password_reset_invalidates_the_user(self):
+        self.service.admin_get_user(self.email)
+
+        self.assertTrue(self.service.reset_password(self.email, "123456", "Newpass-5678"))
+        self.assertEqual(self.service.admin_get_user(self.email)["UserStatus"], "CONFIRMED")
+        self.assertEqual(self.admin_get_user.call_count, 2)
+
+    def test_failed_update_still_invalidates_the_user(self):
+        self.service.admin_get_user(self.email)
+
+        with self.assertRaises(cognito_idp_service.PasswordDoesNotMeetCriteriaException):
+            self.service.reset_password(self.email, "123456", "short")
+        self.service.admin_get_user(self.email)
+        self.assertEqual(self.admin_get_user.call_count, 2)
+
+
+class AccountFlowQueryTests(TestCase):
+    """Pins the number of queries of each step of the sign up and password reset flows."""
+
+    password = "Password-1234!"
+
+    def setUp(self):
+        cache.clear()
+        # The audit log looks up the user's content type once per process - do it before counting
+        ContentType.objects.get_for_model(CustomUser)
+
+    def create_user(self, **fields):
+        return CustomUser.objects.create_user(
+            "student@example.com", password=self.password, first_name="Ada", last_name="Lovelace", **fields
+        )
+
+    def test_sign_up(self):
+        # Two checks that the email is free, the user and its audit log entry, and replacing the code
+        with self.assertNumQueries(6):
+            response = self.client.post(reverse("register"), {
+                "first_name": "Ada",
+                "last_name": "Lovelace",
+                "email": "Student@example.com",
+                "password1": self.password,
+                "password2": self.password,
+            })
+        self.assertRedirects(response, reverse("confirm_email"), fetch_redirect_response=False)
+        self.assertFalse(CustomUser.objects.get(email="student@example.com").is_active)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_confirm_email(self):
+        user = self.create_user(is_active=False)
+        code = VerificationCode.issue(user, VerificationCode.CONFIRM_EMAIL)
+
+        # Finding the user by code, consuming the code, and the audited save of the user
+        with self.assertNumQueries(5):
+            response = self.client.post(reverse("confirm_email"), {"email": user.email, "confirmation_code": code})
+        self.assertRedirects(response, reverse("login"), fetch_redirect_response=False)
+        user.refresh_from_db()
+        self.assertTrue(user.is_active)
+        self.assertFalse(VerificationCode.objects.filter(user=user).exists())
+
+    def test_reset_password(self):
+        user = self.create_user(is_active=True)
+        code = VerificationCode.issue(user, VerificationCode.RESET_PASSWORD)
+
+        # Finding the user by code, consuming the code, and the audited save of the user
+        with self.assertNumQueries(5):
+            response = self.client.post(reverse("reset_password"), {
+                "email": user.email,
+                "confirmation_code": code,
+                "password1": "Newpass-5678!",
+                "password2": "Newpass-5678!",
+            })
+        self.assertRedirects(response, reverse("login"), fetch_redirect_response=False)
+        user.refresh_from_db()
+        self.assertTrue(user.check_password("Newpass-5678!"))
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def post(self, email="student@example.com", ip="192.0.2.1"):
+        return RequestFactory().post("/", {"email": email}, REMOTE_ADDR=ip)
+
+    def test_concurrent_requests_cannot_exceed_the_burst(self):
+        request = self.post()
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            retry_afters = list(executor.map(
+                lambda _: ratelimit.take_token("test", request, rate_per_minute=5, burst=10), range(100)
+            ))
+        self.assertEqual(retry_afters.count(0), 10)
+
+    def test_limit_is_per_email_and_per_ip(self):
+        for i in range(3):
+            self.assertEqual(ratelimit.take_token("test", self.post(ip=f"192.0.2.{i}"), burst=3), 0)
+        # Another address cannot try the same account again
+        self.assertGreater(ratelimit.take_token("test", self.post(ip="192.0.2.99"), burst=3), 0)
+
+        for i in range(3):
+            self.assertEqual(ratelimit.take_token("test", self.post(f"{i}@example.com", ip="198.51.100.1"), burst=3), 0)
+        # The same address cannot try another account
+        self.assertGreater(ratelimit.take_token("test", self.post("new@example.com", ip="198.51.100.1"), burst=3), 0)
+        self.assertEqual(ratelimit.take_token("test", self.post("new@example.com", ip="198.51.100.2"), burst=3), 0)
+
+    def test_attempts_are_allowed_again_in_the_next_window(self):
+        # 2 attempts per minute and a burst of 2 make one-minute windows
+        with mock.patch.object(ratelimit.time, "time", return_value=6000.0):
+            for _ in range(2):
+                self.assertEqual(ratelimit.take_token("test", self.post(), rate_per_minute=2, burst=2), 0)
+            self.assertEqual(ratelimit.take_token("test", self.post(), rate_per_minute=2, burst=2), 60)
+        with mock.patch.object(ratelimit.time, "time", return_value=6060.0):
+            self.assertEqual(ratelimit.take_token("test", self.post(), rate_per_minute=2, burst=2), 0)
+
+    def test_rate_limited_view_returns_429(self):
+        view = ratelimit.rate_limit("test", burst=1)(lambda request: HttpResponse())
+        self.assertEqual(view(self.post()).status_code, 200)
+        response = view(self.post())
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+        # Only POSTs are limited
+        self.assertEqual(view(RequestFactory().get("/")).status_code, 200)
+
+
+def disconnect_login_history(test_case):
+    """Disconnects django_login_history2 for a test: it geolocates every login and logout, which needs the network."""
+    from django_login_history2.models import post_login, post_logout
+
+    user_logged_in.disconnect(post_login)
+    user_logged_out.disconnect(post_logout)
+    test_case.addCleanup(user_logged_in.connect, post_login)
+    test_case.addCleanup(user_logged_out.connect, post_logout)
+
+
+@override_settings(LAST_LOGIN_RECORDING=login_activity.BUFFERED, LAST_LOGIN_BUFFER_FLUSH_THRESHOLD=3,
+                   LAST_LOGIN_BUFFER_FLUSH_INTERVAL=30)
+class LoginActivityTests(TestCase):
+    def setUp(self):
+        disconnect_login_history(self)
+        pending = mock.patch.dict(login_activity._pending, clear=True)
+        pending.start()
+        self.addCleanup(pending.stop)
+        # Start each test just after a flush
+        last_flush = mock.patch.object(login_activity, "_last_flush", time.monotonic())
+        last_flush.start()
+        self.addCleanup(last_flush.stop)
+        self.users = [
+            CustomUser.objects.create_user(f"student{i}@example.com", first_name="Ada", last_name="Lovelace")
+            for i in range(3)
+        ]
+
+    def log_in(self, user):
+        user_logged_in.send(sender=CustomUser, request=None, user=user)
+
+    def last_logins(self):
+        users = CustomUser.objects.filter(pk__in=[user.pk for user in self.users])
+        stored = dict(users.values_list("pk", "last_login"))
+        return [stored[user.pk] for user in self.users]
+
+    def test_login_is_buffered_instead_of_saved(self):
+        # Django's update_last_login receiver would save the user
+        with self.assertNumQueries(0):
+            self.log_in(self.users[0])
+
+        self.assertIsNotNone(self.users[0].last_login)
+        self.assertEqual(self.last_logins(), [None, None, None])
+        self.assertEqual(login_activity.pending_count(), 1)
+
+    def test_connecting_again_keeps_one_receiver(self):
+        login_activity.connect()
+
+        with self.assertNumQueries(0):
+            self.log_in(self.users[0])
+        self.assertEqual(login_activity.pending_count(), 1)
+
+    def test_repeated_logins_are_coalesced(self):
+        for _ in range(3):
+            self.log_in(self.users[0])
+        self.assertEqual(login_activity.pending_count(), 1)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(login_activity.flush_logins(), 1)
+        self.assertEqual(self.last_logins()[0], self.users[0].last_login)
+        self.assertEqual(login_activity.flush_logins(), 0)
+
+    def test_logins_are_flushed_at_the_threshold(self):
+        self.log_in(self.users[0])
+        self.log_in(self.users[1])
+        with self.assertNumQueries(1):
+            self.log_in(self.users[2])
+
+        self.assertEqual(login_activity.pending_count(), 0)
+        self.assertEqual(self.last_logins(), [user.last_login for user in self.users])
+
+    def test_logins_are_flushed_after_the_interval(self):
+        self.log_in(self.users[0])
+        self.assertEqual(login_activity.pending_count(), 1)
+
+        with mock.patch.object(login_activity.time, "monotonic", return_value=time.monotonic() + 31):
+            self.log_in(self.users[1])
+
+        self.assertEqual(login_activity.pending_count(), 0)
+        self.assertEqual(self.last_logins()[:2], [self.users[0].last_login, self.users[1].last_login])
+
+    @override_settings(LAST_LOGIN_RECORDING=login_activity.IMMEDIATE)
+    def test_immediate_recording_keeps_django_receiver(self):
+        with mock.patch.object(user_logged_in, "connect") as connect:
+            login_activity.connect()
+        connect.assert_not_called()
+
+
+@override_settings(SESSION_ENGINE="core.sessions")
+class HybridSessionTests(TestCase):
+    password = "Password-1234!"
+
+    def setUp(self):
+        cache.clear()
+        disconnect_login_history(self)
+        # Write buffered last login times while the test database still exists
+        self.addCleanup(login_activity.flush_logins)
+        self.user = CustomUser.objects.create_user(
+            "student@example.com", password=self.password, first_name="Ada", last_name="Lovelace", is_active=True
+        )
+
+    def session_cookie(self):
+        return self.client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def start_anonymous_session(self):
+        session = sessions.SessionStore()
+        session["theme"] = "dark"
+        session.save()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        return session.session_key
+
+    def log_in(self):
+        # The "login" URL name is taken by the redirect to this view
+        response = self.client.post("/accounts/login/", {"username": self.user.email, "password": self.password})
+        self.assertRedirects(response, settings.LOGIN_REDIRECT_URL, fetch_redirect_response=False)
+
+    def test_anonymous_session_is_kept_in_a_signed_cookie(self):
+        session_key = self.start_anonymous_session()
+
+        self.assertIn(":", session_key)
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(sessions.SessionStore(session_key)["theme"], "dark")
+
+    def test_login_moves_the_session_to_the_database(self):
+        anonymous_key = self.start_anonymous_session()
+        self.log_in()
+
+        session_key = self.session_cookie()
+        self.assertNotEqual(session_key, anonymous_key)
+        self.assertNotIn(":", session_key)
+        self.assertTrue(Session.objects.filter(session_key=session_key).exists())
+        session = sessions.SessionStore(session_key)
+        self.assertEqual(session[SESSION_KEY], str(self.user.pk))
+        self.assertEqual(session["theme"], "dark")
+
+        response = self.client.get(reverse("home"))
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    def test_cycle_key_moves_the_data_to_a_new_key(self):
+        self.log_in()
+        old_key = self.session_cookie()
+
+        session = sessions.SessionStore(old_key)
+        session.cycle_key()
+
+        self.assertNotEqual(session.session_key, old_key)
+        self.assertFalse(session.exists(old_key))
+        self.assertEqual(sessions.SessionStore(session.session_key)[SESSION_KEY], str(self.user.pk))
+
+    def test_logout_deletes_the_session(self):
+        self.log_in()
+        session_key = self.session_cookie()
+
+        self.client.post(reverse("logout"))
+
+        self.assertFalse(Session.objects.filter(session_key=session_key).exists())
+        self.assertFalse(sessions.SessionStore().exists(session_key))
+        # Replaying the old cookie does not log the user back in
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        response = self.client.get(reverse("home"))
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    def test_tampered_cookie_starts_a_new_session(self):
+        session_key = self.start_anonymous_session()
+        data, signature = session_key.rsplit(":", 1)
+        tampered_key = f"{data}:{signature[::-1]}"
+
+        session = sessions.SessionStore(tampered_key)
+        self.assertEqual(dict(session.items()), {})
+        self.assertIsNone(session.session_key)
+
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = tampered_key
+        response = self.client.get(reverse("home"))
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
@@ -7,4 +7,5 @@ urlpatterns = [
     path("confirm_email/", views.confirm_email, name="confirm_email"),
     path("forgot_password/", views.forgot_password, name="forgot_password"),
     path("reset_password/", views.reset_password, name="reset_password"),
+    path("cognito/cache_stats/", views.cognito_user_cache_stats, name="cognito_user_cache_stats"),
 ]
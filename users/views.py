@@ -2,26 +2,20 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from .forms import CustomUserRegisterForm, ConfirmEmailForm, ForgotPasswordForm, ResetPasswordForm
-from .models import CustomUser
+from .models import CustomUser, VerificationCode
 from django.conf import settings
-from core.services.cognito_idp_service import cognito_client, PasswordDoesNotMeetCriteriaException
+from core.services.cognito_idp_service import cognito_client, PasswordDoesNotMeetCriteriaException, user_cache_metrics
 from core.services.email_service import MailSender
 import core.util as util
+from core.ratelimit import rate_limit
 import logging
-from django.http import HttpResponseBadRequest
-import random
-import string
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponseBadRequest, JsonResponse
 
 LOGGER = logging.getLogger(__name__)
 
 
-def generate_random_confirmation_code():
-    # using random.choices()
-    # generating random strings
-    res = "".join(random.choices(string.digits, k=settings.CONFIRMATION_CODE_LENGTH))
-    return str(res)
-
-
+@rate_limit("sign_up")
 def sign_up(request):
     if request.method == "GET":
         form = CustomUserRegisterForm()
@@ -44,6 +38,7 @@ def sign_up(request):
             return render(request, "users/register.html", {"form": form})
 
 
+@rate_limit("confirm_email")
 def confirm_email(request):
     if request.method == "GET":
         form = ConfirmEmailForm(initial={"confirmation_code": request.GET.get("confirmation_code", None)})
@@ -53,16 +48,16 @@ def confirm_email(request):
     if request.method == "POST":
         form = ConfirmEmailForm(request.POST)
         if form.is_valid():
-            # Validation checked that the email and confirmation code are valid
+            # Validation checked that the email and confirmation code are valid and found the user
             # We just need to update the user now to be active and clear out the
             # confirmation code
             try:
-                user = CustomUser.objects.get(email=form.cleaned_data["email"])
+                user = form.user
                 if settings.USE_COGNITO:
                     cognito_client().admin_confirm_sign_up(
                         form.cleaned_data["email"],
                     )
-                user.confirmation_code = None
+                VerificationCode.consume(user, VerificationCode.CONFIRM_EMAIL)
                 user.is_active = True
                 user.save()
                 messages.success(request, f"Email Address {user.email} has been confirmed.  You may now login.")
@@ -76,6 +71,7 @@ def confirm_email(request):
             return render(request, "users/confirm_email.html", {"form": form})
 
 
+@rate_limit("forgot_password")
 def forgot_password(request):
     if request.method == "GET":
         form = ForgotPasswordForm()
@@ -84,13 +80,10 @@ def forgot_password(request):
     if request.method == "POST":
         form = ForgotPasswordForm(request.POST)
         if form.is_valid():
-            # First, we need to create a random confirmation code and add that to the user
+            # First, we need to create a random confirmation code for the user
             # so that we can confirm the user's email address later
-            user = CustomUser.objects.get(email=form.cleaned_data["email"])
-            user.confirmation_code = generate_random_confirmation_code()
-
-            # Now we need to save the user
-            user.save()
+            user = form.user
+            confirmation_code = VerificationCode.issue(user, VerificationCode.RESET_PASSWORD)
 
             # # Now we need to send the confirmation code to the user
             site_url_base = util.get_system_base_url(request)
@@ -98,7 +91,7 @@ def forgot_password(request):
             mail_sender.send_password_reset_confirm_email(
                 from_email=settings.SYSTEM_EMAIL_SENDER,
                 recipients_list=user.email,
-                confirmation_code=user.confirmation_code,
+                confirmation_code=confirmation_code,
                 webapp_base_url=site_url_base,
                 first_name=user.first_name,
             )
@@ -112,6 +105,7 @@ def forgot_password(request):
             return render(request, "users/forgot_password.html", {"form": form})
 
 
+@rate_limit("reset_password")
 def reset_password(request):
     if request.method == "GET":
         form = ResetPasswordForm(initial={"confirmation_code": request.GET.get("confirmation_code", None)})
@@ -125,7 +119,7 @@ def reset_password(request):
             # We just need to update the user now to be active and clear out the
             # confirmation code
             try:
-                user = CustomUser.objects.get(email=form.cleaned_data["email"])
+                user = form.user
                 if settings.USE_COGNITO:
                     cognito_client().reset_password(
                         form.cleaned_data["email"],
@@ -135,7 +129,7 @@ def reset_password(request):
                 else:
                     user.set_password(form.cleaned_data["password1"])
 
-                user.confirmation_code = None
+                VerificationCode.consume(user, VerificationCode.RESET_PASSWORD)
                 user.is_active = True
                 user.save()
 
@@ -159,6 +153,11 @@ def reset_password(request):
             return render(request, "users/reset_password.html", {"form": form})
 
 
+@staff_member_required
+def cognito_user_cache_stats(request):
+    return JsonResponse(user_cache_metrics())
+
+
 def create_new_user(user: CustomUser, site_url_base: str = None) -> CustomUser:
     # For security reasons, we do not allow super users to get created via the api
     # so regardless of the value that is sent in for is_superuser, we will set it to False
@@ -188,20 +187,21 @@ def create_new_user(user: CustomUser, site_url_base: str = None) -> CustomUser:
     # to login with the password they provided
     # Now we need to create a local user record if one does not already exist
 
-    # First, we need to create a random confirmation code and add that to the user
-    # so that we can confirm the user's email address later
-    user.confirmation_code = generate_random_confirmation_code()
     user.is_active = False
 
     # Now we need to save the user
     user.save()
 
+    # Then, we need to create a random confirmation code for the user
+    # so that we can confirm the user's email address later
+    confirmation_code = VerificationCode.issue(user, VerificationCode.CONFIRM_EMAIL)
+
     # # Now we need to send the confirmation code to the user
     mail_sender = MailSender()
-    mail_sender.send_app_registration_email(
+    mail_sender.send_app_registration_confirm_email(
         from_email=settings.SYSTEM_EMAIL_SENDER,
         recipients_list=user.email,
-        confirmation_code=user.confirmation_code,
+        confirmation_code=confirmation_code,
         webapp_base_url=site_url_base,
     )
 